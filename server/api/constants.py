@@ -318,4 +318,60 @@ DEGREE_CHOICES = [
         ('graduation', 'Graduate'),
         ('postgraduation', 'Post Graduate'),
         ('other', 'Other'),
-    ]
\ No newline at end of file
+    ]
+
+# One bit per language code for fast overlap checks; fits in a 64-bit integer
+LANGUAGE_BITS = {code: 1 << index for index, (code, _) in enumerate(LANGUAGE_CHOICES)}
+MAJOR_LANGUAGE_MASK = LANGUAGE_BITS['english'] | LANGUAGE_BITS['hindi']
+
+
+# Profile lookup tables of the matching engine (AdvancedMatchmakingEngine in
+# models and views); UserFeatures stores the levels and prestige derived
+# from them, so run `manage.py rebuild_user_features` after editing them
+
+# Education hierarchy for better matching
+EDUCATION_HIERARCHY = {
+    # Doctorate/Medical (Level 6)
+    'phd': 6, 'md': 6, 'dm': 6, 'mch': 6, 'ms_medical': 6,
+
+    # Masters/Professional (Level 5)
+    'mtech': 5, 'me': 5, 'ms': 5, 'mba': 5, 'mba_finance': 5, 
+    'mba_marketing': 5, 'mba_hr': 5, 'mba_operations': 5, 'mba_it': 5,
+    'pgdm': 5, 'msc': 5, 'mcom': 5, 'ma': 5, 'mca': 5, 'llm': 5,
+    'med': 5, 'mpharm': 5, 'mds': 5, 'march': 5, 'mdes': 5,
+
+    # Professional Bachelor's (Level 4)
+    'mbbs': 4, 'btech': 4, 'be': 4, 'btech_cse': 4, 'btech_ece': 4,
+    'btech_eee': 4, 'btech_mech': 4, 'btech_civil': 4, 'btech_chemical': 4,
+    'btech_it': 4, 'llb': 4, 'bpharm': 4, 'bds': 4, 'barch': 4, 'bvsc': 4,
+    'bca': 4,
+
+    # Regular Bachelor's (Level 3)
+    'bsc': 3, 'bcom': 3, 'ba': 3, 'bba': 3, 'bcom_honours': 3,
+    'bsc_physics': 3, 'bsc_chemistry': 3, 'bsc_cs': 3, 'bsc_it': 3,
+    'ba_english': 3, 'ba_economics': 3, 'bed': 3, 'bfa': 3,
+
+    # Diplomas (Level 2)
+    'diploma': 2, 'polytechnic': 2, 'iti': 2,
+
+    # School (Level 1)
+    '12th': 1,
+
+    # Generic
+    'graduation': 3, 'postgraduation': 5, 'other': 3
+}
+
+# High-prestige companies for company scoring
+PRESTIGE_COMPANIES = [
+    'google', 'microsoft', 'apple', 'amazon', 'meta', 'netflix', 'tesla',
+    'goldman sachs', 'jp morgan', 'morgan stanley', 'blackrock',
+    'mckinsey', 'bain', 'bcg', 'deloitte', 'pwc', 'kpmg', 'ey',
+    'tcs', 'infosys', 'wipro', 'hcl', 'tech mahindra', 'cognizant',
+    'reliance', 'tata', 'adani', 'bajaj', 'mahindra', 'birla'
+]
+
+# Senior designations
+SENIOR_DESIGNATIONS = [
+    'director', 'vp', 'vice president', 'ceo', 'cto', 'cfo', 'founder',
+    'co-founder', 'head', 'lead', 'principal', 'senior manager', 'manager'
+]
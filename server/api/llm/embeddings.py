@@ -0,0 +1,156 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from api.models import CachedEmbedding
+
+
+class HuggingFaceEmbedder:
+    """
+    Mean-pooled token embeddings from the HuggingFace feature_extraction
+    endpoint, one request per batch of texts
+    """
+
+    def __init__(self, client, model):
+        self.client = client
+        self.name = model
+
+    def embed_batch(self, texts):
+        # Token models return a (tokens, dim) matrix per text whose length
+        # varies, so each text is pooled over its own tokens; sentence
+        # models already return one vector per text
+        return np.stack([self._pool(output) for output in self.client.feature_extraction(list(texts))])
+
+    @staticmethod
+    def _pool(output):
+        output = np.asarray(output, dtype=np.float32)
+        return output.reshape(-1, output.shape[-1]).mean(axis=0) if output.ndim > 1 else output
+
+    def embed(self, text):
+        return self.embed_batch([text])[0]
+
+
+class LocalEmbedder:
+    """
+    Deterministic offline stand-in for tests and runs without HF_TOKEN: the
+    mean of pseudo-random token vectors seeded by each lowercased word, so
+    texts sharing words are similar. Not a semantic model.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.name = f"local-hashing-{dim}"
+
+    def _token_vector(self, token):
+        seed = int.from_bytes(hashlib.sha256(token.encode()).digest()[:8], 'little')
+        return np.random.default_rng(seed).standard_normal(self.dim, dtype=np.float32)
+
+    def embed_batch(self, texts):
+        tokenized = [re.findall(r"\w+", text.lower()) or [""] for text in texts]
+        vocabulary = {token: index for index, token in enumerate({token for tokens in tokenized for token in tokens})}
+        token_vectors = np.stack([self._token_vector(token) for token in vocabulary])
+
+        # Mean pooling of every text at once: sum token rows per text, divide by lengths
+        text_index = np.repeat(np.arange(len(tokenized)), [len(tokens) for tokens in tokenized])
+        token_index = np.fromiter((vocabulary[token] for tokens in tokenized for token in tokens), dtype=np.intp)
+        sums = np.zeros((len(tokenized), self.dim), dtype=np.float32)
+        np.add.at(sums, text_index, token_vectors[token_index])
+        return sums / np.array([len(tokens) for tokens in tokenized], dtype=np.float32)[:, None]
+
+    def embed(self, text):
+        return self.embed_batch([text])[0]
+
+
+class EmbeddingCache:
+    """
+    Embeddings addressed by (embedder name, sha256 of the text): an
+    in-process LRU of ``memory_size`` vectors in front of the CachedEmbedding
+    table, which keeps at most ``max_entries`` rows. Texts missing from
+    both are embedded by ``embedder`` and written through.
+    """
+
+    def __init__(self, embedder, memory_size, max_entries, batch_size=32):
+        self.embedder = embedder
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def text_hash(text):
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _remember(self, text_hash, vector):
+        with self._lock:
+            self._memory[text_hash] = vector
+            self._memory.move_to_end(text_hash)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def get(self, text):
+        """The float32 embedding of a text"""
+        return self.get_many([text])[0]
+
+    def get_many(self, texts):
+        """
+        Embeddings of texts as a (len(texts), dim) float32 array: memory hits,
+        then one table lookup, then each remaining distinct text embedded
+        ``batch_size`` texts per embedder call and stored in one insert
+        """
+        hashes = [self.text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            for text_hash in hashes:
+                vector = self._memory.get(text_hash)
+                if vector is not None:
+                    self._memory.move_to_end(text_hash)
+                    found[text_hash] = vector
+        memory_hits = set(found)
+
+        missing = [text_hash for text_hash in dict.fromkeys(hashes) if text_hash not in found]
+        stored = CachedEmbedding.lookup(self.embedder.name, missing) if missing else {}
+        for text_hash, vector in stored.items():
+            found[text_hash] = np.frombuffer(vector, dtype=np.float32)
+
+        texts_by_hash = dict(zip(hashes, texts))
+        to_embed = [text_hash for text_hash in missing if text_hash not in stored]
+        for start in range(0, len(to_embed), self.batch_size):
+            batch = to_embed[start:start + self.batch_size]
+            vectors = np.asarray(self.embedder.embed_batch([texts_by_hash[text_hash] for text_hash in batch]), dtype=np.float32)
+            vectors.flags.writeable = False
+            found.update(zip(batch, vectors))
+        if to_embed:
+            CachedEmbedding.store(
+                self.embedder.name, {text_hash: found[text_hash].tobytes() for text_hash in to_embed}, self.max_entries
+            )
+
+        for text_hash in missing:
+            self._remember(text_hash, found[text_hash])
+        with self._lock:
+            self.memory_hits += sum(text_hash in memory_hits for text_hash in hashes)
+            self.disk_hits += sum(text_hash in stored for text_hash in hashes)
+            self.misses += len(hashes) - sum(text_hash in memory_hits or text_hash in stored for text_hash in hashes)
+        if not hashes:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([found[text_hash] for text_hash in hashes])
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'model': self.embedder.name,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else None,
+            'memory_entries': len(self._memory),
+        }
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
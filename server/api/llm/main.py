@@ -1,9 +1,17 @@
 import os
-from huggingface_hub import InferenceClient
+import asyncio
+import hashlib
+import random
+import threading
+from asgiref.sync import sync_to_async
+from huggingface_hub import AsyncInferenceClient, InferenceClient
 import json
 import requests
 import numpy as np
+from django.conf import settings
 from api.models import User
+from api.llm.embeddings import EmbeddingCache, HuggingFaceEmbedder, LocalEmbedder
+from api.llm.verdicts import VerdictCache, profile_hash
 
 HF_TOKEN = os.getenv("HF_TOKEN")
 
@@ -14,6 +22,15 @@ LLM_MODEL = "mistralai/Mixtral-8x7B-Instruct-v0.1"
 
 embed_client = InferenceClient(model=EMBEDDING_MODEL, token=HF_TOKEN)
 llm_client = InferenceClient(model=LLM_MODEL, token=HF_TOKEN)
+async_llm_client = AsyncInferenceClient(model=LLM_MODEL, token=HF_TOKEN)
+
+if settings.EMBEDDING_BACKEND == "local":
+    embedder = LocalEmbedder()
+else:
+    embedder = HuggingFaceEmbedder(embed_client, EMBEDDING_MODEL)
+embedding_cache = EmbeddingCache(
+    embedder, settings.EMBEDDING_CACHE_MEMORY_SIZE, settings.EMBEDDING_CACHE_MAX_ENTRIES, settings.EMBEDDING_BATCH_SIZE
+)
 
 def generate_matchmaker_email(user, matches, matchmaker_name):
     """
@@ -76,8 +93,12 @@ Write only the email body, without explanations:
 
 # --- Embedding helper ---
 def get_embedding(text: str):
-    output = embed_client.feature_extraction(text)
-    return np.array(output).mean(axis=0)  # mean pooling
+    """Pooled embedding of a text, through the embedding cache"""
+    return embedding_cache.get(text)
+
+def get_embeddings(texts):
+    """(len(texts), dim) pooled embeddings, uncached texts sent EMBEDDING_BATCH_SIZE per request"""
+    return embedding_cache.get_many(texts)
 
 # --- Cosine similarity ---
 def cosine_similarity(vec1, vec2):
@@ -86,8 +107,100 @@ def cosine_similarity(vec1, vec2):
 # --- Load KB ---
 with open("knowledge-base.json", "r") as f:
     kb = json.load(f)
-    print("KB content:", kb)
-    print("KB keys:", kb.keys())
+
+
+def document_text(doc):
+    """Text embedded and quoted for a KB document: its ``text``, else the whole entry as JSON"""
+    return doc.get("text") or json.dumps(doc, sort_keys=True, ensure_ascii=False)
+
+
+# --- KB embedding index ---
+class KnowledgeBaseIndex:
+    """
+    Normalized float32 embeddings of the KB documents, persisted as one
+    memory-mappable .npy of (content hash, embedding) records in document
+    order. Building only embeds documents whose hash is not in the current
+    file; the hash covers the embedding model, so changing it re-embeds all.
+    """
+
+    def __init__(self, documents, path=None, model=None):
+        self.documents = documents
+        self.path = str(path or settings.KB_INDEX_PATH)
+        self.model = model or embedder.name
+        self._records = None
+        self._lock = threading.Lock()
+
+    def document_hash(self, doc):
+        return hashlib.sha256(f"{self.model}\0{document_text(doc)}".encode()).hexdigest()
+
+    def version(self):
+        """Hash of the indexed content; changes with any document or the embedding model"""
+        return hashlib.sha256("".join(self.document_hash(doc) for doc in self.documents).encode()).hexdigest()[:16]
+
+    def _load(self):
+        try:
+            return np.load(self.path, mmap_mode="r")
+        except FileNotFoundError:
+            return None
+
+    def build(self, embed_many=None, full=False):
+        """Write the index for the current documents; returns how many were embedded"""
+        embed_many = embed_many or get_embeddings
+        current = self._load() if not full else None
+        known = {} if current is None else dict(zip(current["hash"].astype(str), current["embedding"]))
+
+        hashes = [self.document_hash(doc) for doc in self.documents]
+        changed = {digest: doc for doc, digest in zip(self.documents, hashes) if digest not in known}
+        if changed:
+            vectors = np.asarray(embed_many([document_text(doc) for doc in changed.values()]), dtype=np.float32)
+            known.update(zip(changed, vectors / np.linalg.norm(vectors, axis=1, keepdims=True)))
+        embedded = len(changed)
+        embeddings = [known[digest] for digest in hashes]
+
+        dim = len(embeddings[0]) if embeddings else 0
+        records = np.empty(len(hashes), dtype=[("hash", "S64"), ("embedding", np.float32, (dim,))])
+        records["hash"] = hashes
+        if embeddings:
+            records["embedding"] = np.stack(embeddings)
+
+        # Replace atomically so readers never map a partial file
+        partial = f"{self.path}.partial.npy"
+        np.save(partial, records)
+        os.replace(partial, self.path)
+        self._records = None
+        return embedded
+
+    def records(self):
+        """The index of the current documents, rebuilt first if missing or out of date"""
+        with self._lock:
+            if self._records is None:
+                records = self._load()
+                hashes = [self.document_hash(doc).encode() for doc in self.documents]
+                if records is None or records["hash"].tolist() != hashes:
+                    self.build()
+                    records = self._load()
+                self._records = records
+            return self._records
+
+    def search(self, query_embedding, top_k=5):
+        """Indices of the top_k documents by cosine similarity, best first"""
+        return self.search_many(np.asarray(query_embedding)[None, :], top_k)[0]
+
+    def search_many(self, query_embeddings, top_k=5):
+        """search for each row of a (queries, dim) matrix, with one matrix product"""
+        embeddings = self.records()["embedding"]
+        top_k = min(top_k, len(embeddings))
+        if top_k == 0:
+            return [[] for _ in query_embeddings]
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ embeddings.T
+        tops = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        # Best first, earlier documents first among equal scores
+        return [top[np.lexsort((top, -row[top]))].tolist() for row, top in zip(scores, tops)]
+
+
+kb_index = KnowledgeBaseIndex(kb["documents"])
 
 
 def get_user_profile(user_id):
@@ -98,32 +211,61 @@ def get_user_profile(user_id):
 
 # --- Retrieve relevant docs ---
 def retrieve_relevant_docs(query, top_k=5):
-    query_emb = get_embedding(query)
-    docs_with_scores = []
+    """One query embedding and a product with the precomputed KB index"""
+    return retrieve_relevant_docs_many([query], top_k)[0]
 
-    for doc in kb["documents"]:
-        doc_emb = get_embedding(doc["text"])
-        score = cosine_similarity(query_emb, doc_emb)
-        docs_with_scores.append((doc, score))
 
-    docs_with_scores.sort(key=lambda x: x[1], reverse=True)
-    return [d[0] for d in docs_with_scores[:top_k]]
+def retrieve_relevant_docs_many(queries, top_k=5):
+    """retrieve_relevant_docs for several queries, embedded in batches"""
+    return [
+        [kb["documents"][index] for index in indices]
+        for indices in kb_index.search_many(get_embeddings(queries), top_k)
+    ]
 
 # --- Ask LLM ---
-def get_compatibility_score(target_user, selected_user, context_docs):
-    prompt = f"""
+LLM_GENERATION = {"max_new_tokens": 300, "temperature": 0.2}
+# Bump whenever compatibility_prompt or LLM_GENERATION change, so cached verdicts are not reused
+COMPATIBILITY_PROMPT_VERSION = "1"
+
+verdict_cache = VerdictCache(LLM_MODEL, COMPATIBILITY_PROMPT_VERSION, kb_index.version())
+
+
+def profile_payload(user):
+    """The profile fields compared by the prompt, JSON-serializable"""
+    return {
+        "age": user.age if user.date_of_birth else None,
+        "gender": user.gender,
+        "city": user.city,
+        "country": user.country,
+        "height": user.height,
+        "degree": user.degree,
+        "current_company": user.current_company,
+        "designation": user.designation,
+        "marital_status": user.marital_status,
+        "languages_known": sorted(lang.name for lang in user.languages_known.all()),
+        "siblings": user.siblings,
+        "caste": user.caste,
+        "religion": user.religion,
+        "want_kids": user.want_kids,
+        "open_to_relocate": user.open_to_relocate,
+        "open_to_pets": user.open_to_pets,
+    }
+
+
+def compatibility_prompt(target_user, selected_user, context_docs):
+    return f"""
 You are a compatibility evaluator for the Natural Language Backend project.
 where the preference of the users are assumed to be people who are in their late 20s to early 30s earning great money and doing great careerwise but have previously struggled with dating apps and not able to get a match through traditional indian arrange marriage setup
 You are given two users:
 
 Target User:
-{json.dumps(target_user, indent=2)}
+{json.dumps(profile_payload(target_user), indent=2)}
 
 Selected User:
-{json.dumps(selected_user, indent=2)}
+{json.dumps(profile_payload(selected_user), indent=2)}
 
 Relevant Project Context:
-{[doc['text'] for doc in context_docs]}
+{[document_text(doc) for doc in context_docs]}
 
 Evaluate compatibility based on:
 -Age
@@ -148,46 +290,141 @@ Output ONLY in JSON:
   "reason": "<brief explanation>"
 }}
 """
-    completion = llm_client.text_generation(
-        prompt,
-        max_new_tokens=300,
-        temperature=0.2
-    )
 
+
+def parse_compatibility(completion):
     try:
         parsed = json.loads(completion.strip().split("{", 1)[1].rsplit("}", 1)[0].join(["{", "}"]))
         return parsed
     except Exception:
         return {"compatibility_score": None, "reason": "Failed to parse model output"}
 
+
+def verdict_key(target_user, selected_user):
+    return profile_hash(profile_payload(target_user)), profile_hash(profile_payload(selected_user))
+
+
+def get_compatibility_score(target_user, selected_user, context_docs):
+    key = verdict_key(target_user, selected_user)
+    cached = verdict_cache.lookup([key]).get(key)
+    if cached:
+        return cached
+
+    completion = llm_client.text_generation(
+        compatibility_prompt(target_user, selected_user, context_docs), **LLM_GENERATION
+    )
+    return verdict_cache.store(key, parse_compatibility(completion))
+
 # --- Pipeline ---
+def user_query_string(user):
+    """Relevant profile fields of a user as a RAG query string"""
+    return ' '.join([
+        f"{user.first_name or ''} {user.last_name or ''}".strip(),
+        str(user.gender or ''),
+        str(user.city or ''),
+        str(user.country or ''),
+        str(user.height or ''),
+        str(user.degree or ''),
+        str(user.current_company or ''),
+        str(user.designation or ''),
+        str(user.marital_status or ''),
+        ','.join(lang.name for lang in user.languages_known.all()),
+        str(user.siblings or ''),
+        str(user.caste or ''),
+        str(user.religion or ''),
+        str(user.want_kids or ''),
+        str(user.open_to_relocate or ''),
+        str(user.open_to_pets or '')
+    ])
+
+
 def rag_compatibility_pipeline(target_user_id, selected_user_id):
-    target_user = get_user_profile(target_user_id)
-    selected_user = get_user_profile(selected_user_id)
-
-    # Build a query string from relevant user fields for RAG
-    def user_query_string(user):
-        return ' '.join([
-            f"{user.first_name or ''} {user.last_name or ''}".strip(),
-            str(user.gender or ''),
-            str(user.city or ''),
-            str(user.country or ''),
-            str(user.height or ''),
-            str(user.degree or ''),
-            str(user.current_company or ''),
-            str(user.designation or ''),
-            str(user.marital_status or ''),
-            ','.join(lang.name for lang in user.languages_known.all()),
-            str(user.siblings or ''),
-            str(user.caste or ''),
-            str(user.religion or ''),
-            str(user.want_kids or ''),
-            str(user.open_to_relocate or ''),
-            str(user.open_to_pets or '')
-        ])
-
-
-    query = user_query_string(target_user) + ' ' + user_query_string(selected_user)
-    relevant_docs = retrieve_relevant_docs(query)
-
-    return get_compatibility_score(target_user, selected_user, relevant_docs)
\ No newline at end of file
+    return rag_compatibility_batch([(target_user_id, selected_user_id)])[0]
+
+
+def compatibility_requests(pairs):
+    """
+    A (verdict cache key, cached verdict, prompt) triple per (target id,
+    selected id) pair. The users are loaded in one query; only pairs missing
+    from the verdict cache get a prompt, their RAG queries embedded in
+    batches. Pairs with a missing user get (None, None, None).
+    """
+    users = User.objects.prefetch_related('languages_known').in_bulk({user_id for pair in pairs for user_id in pair})
+    keys = [
+        verdict_key(users[target_id], users[selected_id]) if target_id in users and selected_id in users else None
+        for target_id, selected_id in pairs
+    ]
+    cached = verdict_cache.lookup([key for key in keys if key])
+
+    uncached = [(index, users[target_id], users[selected_id]) for index, ((target_id, selected_id), key)
+                in enumerate(zip(pairs, keys)) if key and key not in cached]
+    contexts = retrieve_relevant_docs_many([
+        user_query_string(target_user) + ' ' + user_query_string(selected_user) for _, target_user, selected_user in uncached
+    ]) if uncached else []
+    prompts = {
+        index: compatibility_prompt(target_user, selected_user, docs)
+        for (index, target_user, selected_user), docs in zip(uncached, contexts)
+    }
+    return [(key, cached.get(key), prompts.get(index)) for index, key in enumerate(keys)]
+
+
+def store_verdicts(compat_requests, verdicts):
+    """Results of compatibility_requests given the new verdicts of their prompts, which get cached"""
+    return [
+        verdict_cache.store(key, verdict) if prompt is not None else cached
+        for (key, cached, prompt), verdict in zip(compat_requests, verdicts)
+    ]
+
+
+def rag_compatibility_batch(pairs):
+    """
+    rag_compatibility_pipeline for many pairs, cached verdicts reused and the
+    other LLM calls made one after another; None for missing users
+    """
+    compat_requests = compatibility_requests(pairs)
+    verdicts = [
+        parse_compatibility(llm_client.text_generation(prompt, **LLM_GENERATION)) if prompt is not None else None
+        for _, _, prompt in compat_requests
+    ]
+    return store_verdicts(compat_requests, verdicts)
+
+
+async def generate_verdicts_async(prompts, client=None, concurrency=None, timeout=None, retries=None, backoff=None):
+    """
+    Parsed LLM verdicts of many prompts, requested concurrently: at most
+    ``concurrency`` calls in flight, each attempt cut off after ``timeout``
+    seconds and retried ``retries`` times with jittered exponential backoff.
+    Defaults come from the LLM_* settings; None prompts give None.
+    """
+    client = client or async_llm_client
+    semaphore = asyncio.Semaphore(concurrency or settings.LLM_CONCURRENCY)
+    timeout = timeout or settings.LLM_TIMEOUT
+    retries = settings.LLM_RETRIES if retries is None else retries
+    backoff = settings.LLM_BACKOFF if backoff is None else backoff
+
+    async def verdict(prompt):
+        if prompt is None:
+            return None
+        for attempt in range(retries + 1):
+            try:
+                async with semaphore:
+                    completion = await asyncio.wait_for(client.text_generation(prompt, **LLM_GENERATION), timeout)
+                return parse_compatibility(completion)
+            except Exception as e:  # timeouts and request errors
+                error = e
+            if attempt < retries:
+                await asyncio.sleep(backoff * 2 ** attempt * (1 + random.random()))
+        return {"compatibility_score": None, "reason": f"LLM request failed: {error!r}"}
+
+    return await asyncio.gather(*(verdict(prompt) for prompt in prompts))
+
+
+async def evaluate_pairs_async(pairs, **options):
+    """
+    rag_compatibility_pipeline for many (target id, selected id) pairs with
+    cached verdicts reused and the LLM calls in parallel, see
+    generate_verdicts_async for ``options``
+    """
+    compat_requests = await sync_to_async(compatibility_requests)(pairs)
+    verdicts = await generate_verdicts_async([prompt for _, _, prompt in compat_requests], **options)
+    return await sync_to_async(store_verdicts)(compat_requests, verdicts)
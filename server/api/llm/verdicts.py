@@ -0,0 +1,88 @@
+import hashlib
+import json
+import threading
+from numbers import Real
+
+from api.models import CompatibilityVerdict
+
+
+def profile_hash(payload):
+    """sha256 of a JSON-serializable profile, independent of key order"""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class VerdictCache:
+    """
+    Parsed LLM compatibility verdicts persisted in CompatibilityVerdict. Keys
+    are (target profile hash, candidate profile hash) pairs, scoped to the
+    model, prompt template version and KB index version given here. Verdicts
+    without a numeric score, i.e. parse or request failures, are not stored,
+    so those pairs are asked again next time.
+    """
+
+    def __init__(self, model, prompt_version, kb_version):
+        self.model = model
+        self.prompt_version = prompt_version
+        self.kb_version = kb_version
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.uncacheable = 0
+        self._lock = threading.Lock()
+
+    def _rows(self):
+        return CompatibilityVerdict.objects.filter(
+            model=self.model, prompt_version=self.prompt_version, kb_version=self.kb_version
+        )
+
+    def lookup(self, keys):
+        """Cached verdicts by key, in one query"""
+        keys = set(keys)
+        if not keys:
+            return {}
+        rows = self._rows().filter(
+            target_hash__in={target for target, _ in keys}, candidate_hash__in={candidate for _, candidate in keys}
+        ).values_list('target_hash', 'candidate_hash', 'compatibility_score', 'reason')
+        found = {
+            (target, candidate): {'compatibility_score': score, 'reason': reason}
+            for target, candidate, score, reason in rows if (target, candidate) in keys
+        }
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def store(self, key, verdict):
+        """
+        Persist a freshly parsed verdict if it has a numeric score; returns it
+        in the form lookup() will serve it in later
+        """
+        score = verdict.get('compatibility_score') if isinstance(verdict, dict) else None
+        if not isinstance(score, Real) or isinstance(score, bool):
+            with self._lock:
+                self.uncacheable += 1
+            return verdict
+
+        verdict = {'compatibility_score': float(score), 'reason': str(verdict.get('reason', ''))}
+        target_hash, candidate_hash = key
+        CompatibilityVerdict.objects.bulk_create([CompatibilityVerdict(
+            target_hash=target_hash, candidate_hash=candidate_hash, model=self.model,
+            prompt_version=self.prompt_version, kb_version=self.kb_version, **verdict,
+        )], ignore_conflicts=True)
+        with self._lock:
+            self.stored += 1
+        return verdict
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'model': self.model,
+            'prompt_version': self.prompt_version,
+            'kb_version': self.kb_version,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'stored': self.stored,
+            'uncacheable': self.uncacheable,
+            'entries': self._rows().count(),
+        }
@@ -0,0 +1,82 @@
+import os
+import time
+from datetime import date
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from ...constants import CASTE_CHOICES, LANGUAGE_BITS, MARITAL_STATUS_CHOICES, RELIGION_CHOICES, YES_NO_MAYBE_CHOICES
+from ...matching import CandidateFeatures, ParallelScorer, TopKSelector
+from ...views import AdvancedMatchmakingEngine
+
+
+CITIES = ['mumbai', 'delhi', 'bangalore', 'pune', 'chennai', 'hyderabad', None]
+COUNTRIES = ['india', 'india', 'india', 'usa', 'uk', None]
+LANGUAGE_MASKS = [bit for _, bit in sorted(LANGUAGE_BITS.items())[:12]]
+
+
+class Command(BaseCommand):
+    help = "Benchmark top-25 matching over synthetic profiles for several pool sizes and worker counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help="Candidate pool sizes")
+        parser.add_argument('--workers', type=int, nargs='+', help="Worker counts (default 1, 2, 4 ... CPU count)")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement, best is reported")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        cpus = os.cpu_count() or 1
+        worker_counts = options['workers'] or sorted({1, 2, 4, cpus} - {n for n in (2, 4) if n > cpus})
+        engine = AdvancedMatchmakingEngine()
+        rng = np.random.default_rng(options['seed'])
+        target = CandidateFeatures(*self._profiles(rng, 1, 'male')[0])
+
+        self.stdout.write(f"{cpus} CPUs available")
+        for size in options['sizes']:
+            rows = self._profiles(rng, size, 'female')
+            serial = None
+            for workers in worker_counts:
+                scorer = ParallelScorer(engine, workers, min_pool=0)
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    scorer.select(target, rows, TopKSelector(k=25, threshold=30))
+                    timings.append(time.perf_counter() - started)
+
+                best = min(timings)
+                serial = serial or best
+                self.stdout.write(
+                    f"{size:>10,} profiles  {workers:>3} workers  {best * 1000:>9.1f} ms  speedup x{serial / best:.2f}"
+                )
+
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark finished"))
+
+    def _profiles(self, rng, count, gender):
+        """Synthetic FEATURE_FIELDS tuples, ids from 1"""
+        def pick(choices):
+            return [choices[index] for index in rng.integers(len(choices), size=count)]
+
+        def nullable(values, missing=0.1):
+            return [None if drop else value for value, drop in zip(values, rng.random(count) < missing)]
+
+        ages = rng.integers(22, 45, size=count)
+        columns = [
+            range(1, count + 1),
+            [gender] * count,
+            (date.today().year - ages).tolist(),
+            (rng.integers(1, 13, size=count) * 100 + rng.integers(1, 29, size=count)).tolist(),
+            nullable(np.round(rng.uniform(300000, 3000000, size=count), 2).tolist()),
+            pick([code for code, _ in RELIGION_CHOICES]),
+            nullable(pick([code for code, _ in CASTE_CHOICES])),
+            pick(CITIES),
+            pick(COUNTRIES),
+            (rng.random(count) < 0.5).tolist(),
+            nullable(pick([code for code, _ in YES_NO_MAYBE_CHOICES])),
+            rng.integers(0, 7, size=count).tolist(),
+            pick([0.5, 0.7, 0.8, 1.0]),
+            pick([code for code, _ in MARITAL_STATUS_CHOICES]),
+            rng.integers(-1, 5, size=count).tolist(),
+            [a | b for a, b in zip(pick(LANGUAGE_MASKS), pick(LANGUAGE_MASKS + [0]))],
+            nullable(np.round(rng.uniform(1.5, 2.0, size=count), 2).tolist()),
+            nullable(pick([code for code, _ in YES_NO_MAYBE_CHOICES])),
+        ]
+        return list(zip(*columns))
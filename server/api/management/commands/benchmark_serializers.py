@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from ...models import User
+from ...serializers import FastUserSerializer, UserSerializer
+
+
+class Command(BaseCommand):
+    help = "Benchmark per-row cost of UserSerializer against FastUserSerializer on the stored users"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per measurement, best is reported")
+
+    def handle(self, *args, **options):
+        users = User.objects.select_related('matchmaker').prefetch_related('languages_known').order_by('created_at')
+        count = users.count()
+        if not count:
+            self.stdout.write(self.style.WARNING("No users to serialize"))
+            return
+
+        if FastUserSerializer(users, many=True).data != UserSerializer(users, many=True).data:
+            self.stderr.write("FastUserSerializer output differs from UserSerializer")
+
+        # Queries included: each run fetches and renders the whole list
+        self.stdout.write(f"{count} users")
+        baseline = None
+        for serializer_class in (UserSerializer, FastUserSerializer):
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                serializer_class(users.all(), many=True).data
+                timings.append(time.perf_counter() - started)
+
+            best = min(timings)
+            baseline = baseline or best
+            self.stdout.write(
+                f"{serializer_class.__name__:>20}  {best * 1000:>8.1f} ms  {best / count * 1e6:>7.1f} µs/row  speedup x{baseline / best:.2f}"
+            )
+
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark finished"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from api.llm.main import KnowledgeBaseIndex, kb
+
+
+class Command(BaseCommand):
+    help = "Embed the knowledge-base documents whose content changed and persist the retrieval index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help="Index file (default settings.KB_INDEX_PATH)")
+        parser.add_argument('--full', action='store_true', help="Re-embed every document")
+
+    def handle(self, *args, **options):
+        index = KnowledgeBaseIndex(kb['documents'], path=options['path'])
+        embedded = index.build(full=options['full'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Indexed {len(kb['documents'])} documents ({embedded} embedded) in {index.path}"
+        ))
@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from ...matching import LOAD_CHUNK_SIZE, match_export_lines
+from ...models import User
+from ...views import AdvancedMatchmakingEngine
+
+
+class Command(BaseCommand):
+    help = "Export every candidate's match score for a user as newline-delimited JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_id', type=int)
+        parser.add_argument('--output', help="File to write to (default stdout)")
+        parser.add_argument('--chunk-size', type=int, default=LOAD_CHUNK_SIZE, help="Candidates scored per chunk")
+
+    def handle(self, *args, **options):
+        try:
+            target_user = User.objects.get(id=options['user_id'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user_id']} does not exist")
+        if not target_user.date_of_birth:
+            raise CommandError("User must have date of birth to find matches")
+
+        lines = match_export_lines(AdvancedMatchmakingEngine(), target_user, options['chunk_size'])
+        if not options['output']:
+            for chunk in lines:
+                sys.stdout.write(chunk)
+            return
+
+        with open(options['output'], 'w') as output:
+            for chunk in lines:
+                output.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f"✅ Exported matches for user {target_user.id} to {options['output']}"))
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from ...matching import start_of_day, weights_fingerprint
+from ...models import MatchList, MatchListJob, User
+from ...views import AdvancedMatchmakingEngine, materialize_match_list
+
+
+class Command(BaseCommand):
+    help = "Worker that recomputes the materialized match lists queued in MatchListJob"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Enqueue every assigned user before starting")
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is drained instead of polling")
+        parser.add_argument('--batch-size', type=int, default=50, help="Jobs claimed per round")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to wait when the queue is empty")
+
+    def handle(self, *args, **options):
+        engine = AdvancedMatchmakingEngine()
+        if options['all']:
+            MatchListJob.enqueue(self._targets().values_list('id', flat=True))
+
+        computed = 0
+        failed = set()
+        while True:
+            self._enqueue_outdated(engine)
+            # Failed jobs stay queued and are retried once the rest of the queue is drained
+            jobs = list(MatchListJob.objects.exclude(user_id__in=failed).order_by('enqueued_at')[:options['batch_size']])
+            if not jobs:
+                if options['once']:
+                    break
+                failed.clear()
+                time.sleep(options['interval'])
+                continue
+            computed += self._run(engine, [job.user_id for job in jobs], failed)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Materialized {computed} match lists"))
+
+    def _targets(self):
+        """Users that get a match list: assigned and with a date of birth"""
+        return User.objects.filter(matchmaker__isnull=False, date_of_birth__isnull=False)
+
+    def _enqueue_outdated(self, engine):
+        """Ages, and with them scores and candidate pools, change daily; lists of another engine are redone"""
+        outdated = MatchList.outdated(engine.VERSION, weights_fingerprint(engine), start_of_day()).exclude(
+            user_id__in=MatchListJob.objects.values('user_id')
+        )
+        MatchListJob.enqueue(outdated.values_list('user_id', flat=True))
+
+    def _run(self, engine, user_ids, failed):
+        """Materialize the lists of claimed jobs; each success completes its own job, failures are added to failed"""
+        started_at = timezone.now()
+        computed = 0
+        targets = self._targets().filter(id__in=user_ids)
+        for target in targets:
+            try:
+                materialize_match_list(target, engine)
+                computed += 1
+            except Exception as e:
+                failed.add(target.id)
+                self.stderr.write(f"Error materializing matches for user {target.id}: {e}")
+
+        # Users that no longer get a list lose it along with their job
+        dropped = set(user_ids) - {target.id for target in targets}
+        MatchList.objects.filter(user_id__in=dropped).delete()
+        MatchListJob.complete(dropped, started_at)
+        return computed
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from ...models import MatchListJob, MatchScore, User, UserFeatures
+
+
+class Command(BaseCommand):
+    help = "Rebuild the precomputed matching features of every User in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Users refreshed per bulk upsert")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        chunk = []
+        rebuilt = 0
+        for user in User.objects.only(*UserFeatures.SOURCE_FIELDS).order_by('id').iterator(chunk_size=chunk_size):
+            chunk.append(user)
+            if len(chunk) == chunk_size:
+                self._rebuild(chunk)
+                rebuilt += len(chunk)
+                chunk = []
+
+        self._rebuild(chunk)
+        rebuilt += len(chunk)
+
+        # Bulk updates bypass the signals, so every match list may be stale
+        MatchListJob.enqueue(
+            User.objects.filter(matchmaker__isnull=False, date_of_birth__isnull=False).values_list('id', flat=True)
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt matching features for {rebuilt} users"))
+
+    def _rebuild(self, users):
+        """Refresh the features of a chunk and drop the scores cached from the old ones"""
+        UserFeatures.refresh(users)
+        MatchScore.invalidate(user.id for user in users)
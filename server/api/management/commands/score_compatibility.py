@@ -0,0 +1,46 @@
+import asyncio
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from api.llm.main import evaluate_pairs_async, verdict_cache
+from ...models import MatchList, User
+from ...views import materialize_match_list
+
+
+class Command(BaseCommand):
+    help = "Evaluate a user's top matches (or given candidates) with the LLM, all pairs concurrently"
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_id', type=int)
+        parser.add_argument('--candidates', type=int, nargs='+', help="Candidate ids (default the user's top matches)")
+        parser.add_argument('--top', type=int, default=25, help="Top matches evaluated without --candidates")
+        parser.add_argument('--concurrency', type=int, help="LLM calls in flight (default settings.LLM_CONCURRENCY)")
+        parser.add_argument('--timeout', type=float, help="Seconds per attempt (default settings.LLM_TIMEOUT)")
+        parser.add_argument('--retries', type=int, help="Retries per pair (default settings.LLM_RETRIES)")
+
+    def handle(self, *args, **options):
+        user_id = options['user_id']
+        candidate_ids = options['candidates'] or self._top_matches(user_id, options['top'])
+
+        started = time.perf_counter()
+        verdicts = asyncio.run(evaluate_pairs_async(
+            [(user_id, candidate_id) for candidate_id in candidate_ids],
+            concurrency=options['concurrency'], timeout=options['timeout'], retries=options['retries'],
+        ))
+        elapsed = time.perf_counter() - started
+
+        for candidate_id, verdict in zip(candidate_ids, verdicts):
+            self.stdout.write(json.dumps({'candidate_id': candidate_id, **(verdict or {'error': 'User not found'})}))
+        self.stdout.write(f"Verdict cache: {json.dumps(verdict_cache.stats())}")
+        self.stdout.write(self.style.SUCCESS(f"✅ Evaluated {len(candidate_ids)} pairs in {elapsed:.1f}s"))
+
+    def _top_matches(self, user_id, top):
+        """Ids of the user's materialized top matches, computing the list if needed"""
+        match_list = MatchList.objects.filter(user_id=user_id).first()
+        if match_list is None:
+            user = User.objects.filter(id=user_id, date_of_birth__isnull=False).first()
+            if user is None:
+                raise CommandError(f"User {user_id} does not exist or has no date of birth")
+            match_list = materialize_match_list(user)
+        return [match['id'] for match in match_list.matches[:top]]
@@ -0,0 +1,1123 @@
+"""
+Vectorized batch scoring for AdvancedMatchmakingEngine.
+
+Profiles are encoded once into columnar NumPy arrays and all twelve
+parameter scores plus the weighted total are computed for the whole
+candidate pool in one pass. The rules mirror the engine's ``_score_*``
+methods exactly, so the ranking is identical to calling
+``calculate_comprehensive_score`` per candidate; reason strings are only
+built afterwards for the matches that are actually returned.
+"""
+import hashlib
+import heapq
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+
+from .constants import MAJOR_LANGUAGE_MASK
+from .models import MatchScore, User, UserFeatures
+
+
+# Parameter order matches the engine's weight dicts and the accumulation
+# order of the weighted total, so totals are bit-for-bit identical
+PARAMETERS = (
+    'age',
+    'income',
+    'caste_religion',
+    'location_relocate',
+    'want_kids',
+    'education',
+    'company_designation',
+    'marital_status',
+    'siblings',
+    'languages',
+    'height',
+    'open_to_pets',
+)
+
+MODERN_RELIGIONS = ('atheist', 'agnostic', 'spiritual')
+
+# Flat per-profile feature tuple consumed by ProfileEncoder; apart from
+# ``id`` these are the UserFeatures columns
+FEATURE_FIELDS = (
+    'id',
+    'gender',
+    'birth_year',
+    'birth_monthday',
+    'income',
+    'religion',
+    'caste',
+    'city',
+    'country',
+    'relocate',
+    'want_kids',
+    'education_level',
+    'prestige',
+    'marital_status',
+    'siblings',
+    'languages',
+    'height',
+    'open_to_pets',
+)
+
+STORE_COLUMNS = ('user_id',) + FEATURE_FIELDS[1:]
+
+# Feature rows fetched per database round trip when streaming a pool
+LOAD_CHUNK_SIZE = 2000
+
+# Widest candidate-minus-target age difference that still scores above 0 in
+# _score_age_compatibility, per target gender (anything but 'male' uses the
+# female rules)
+NONZERO_AGE_DIFFERENCE = {
+    'male': (-10, 5),
+    'female': (-3, 10),
+}
+
+# String features compared only for equality, stored as integer codes (-1 = missing)
+CATEGORICAL_FIELDS = (
+    'gender', 'religion', 'caste', 'city', 'country',
+    'want_kids', 'marital_status', 'open_to_pets',
+)
+
+FEATURE_DTYPES = {
+    'id': np.int64,
+    'birth_year': np.int32,
+    'birth_monthday': np.int32,
+    'income': np.float64,
+    'relocate': np.bool_,
+    'education_level': np.int8,
+    'prestige': np.float64,
+    'siblings': np.int32,
+    'languages': np.uint64,
+    'height': np.float64,
+}
+
+
+def profile_features(user, languages=None):
+    """
+    Derive the FEATURE_FIELDS tuple of one profile without touching the
+    store (a CandidateFeatures record is unpacked as is)
+    """
+    if isinstance(user, CandidateFeatures):
+        return tuple(getattr(user, field) for field in FEATURE_FIELDS)
+    features = UserFeatures.derive(user, languages)
+    return tuple(getattr(features, column) for column in STORE_COLUMNS)
+
+
+class CandidateFeatures:
+    """Compact slotted record of one profile's FEATURE_FIELDS"""
+
+    __slots__ = FEATURE_FIELDS
+
+    def __init__(self, *values):
+        for field, value in zip(FEATURE_FIELDS, values):
+            setattr(self, field, value)
+
+    def age(self, today=None):
+        today = today or date.today()
+        return today.year - self.birth_year - (today.month * 100 + today.day < self.birth_monthday)
+
+
+def as_features(profile):
+    """CandidateFeatures for a User instance (or an existing record)"""
+    if isinstance(profile, CandidateFeatures):
+        return profile
+    return CandidateFeatures(*profile_features(profile))
+
+
+class MatchResult:
+    """
+    One selected candidate: its features, weighted total and parameter
+    scores in a fixed float array indexed like PARAMETERS. Reason text is
+    only built by explain(), when the match is serialized.
+    """
+
+    __slots__ = ('candidate', 'total', 'scores')
+
+    def __init__(self, candidate, total, scores):
+        self.candidate = candidate
+        self.total = total
+        self.scores = scores
+
+    def score(self, param):
+        return float(self.scores[PARAMETERS.index(param)])
+
+    def explain(self, engine, target):
+        """Full calculate_comprehensive_score breakdown, reasons included"""
+        return engine.calculate_comprehensive_score(target, self.candidate)
+
+
+class _LazyMatches:
+    """Builds MatchResult objects only for candidates a TopKSelector keeps"""
+
+    __slots__ = ('rows', 'scores', 'totals')
+
+    def __init__(self, rows, scores, totals):
+        self.rows = rows
+        self.scores = scores
+        self.totals = totals
+
+    def __getitem__(self, position):
+        return MatchResult(
+            CandidateFeatures(*self.rows[position]), float(self.totals[position]), self.scores[:, position].copy()
+        )
+
+
+class MutualMatchResult(MatchResult):
+    """MatchResult ranked by a combined score, with both one-sided totals"""
+
+    __slots__ = ('forward_total', 'reverse_total')
+
+    def __init__(self, candidate, total, scores, forward_total, reverse_total):
+        super().__init__(candidate, total, scores)
+        self.forward_total = forward_total
+        self.reverse_total = reverse_total
+
+
+class _LazyMutualMatches(_LazyMatches):
+    """_LazyMatches ranked by combined scores, building MutualMatchResults"""
+
+    __slots__ = ('forward_totals', 'reverse_totals')
+
+    def __init__(self, rows, scores, totals, forward_totals, reverse_totals):
+        super().__init__(rows, scores, totals)
+        self.forward_totals = forward_totals
+        self.reverse_totals = reverse_totals
+
+    def __getitem__(self, position):
+        return MutualMatchResult(
+            CandidateFeatures(*self.rows[position]), float(self.totals[position]), self.scores[:, position].copy(),
+            float(self.forward_totals[position]), float(self.reverse_totals[position]),
+        )
+
+
+def start_of_day(today=None):
+    """
+    Aware local midnight starting ``today``: what was computed before it
+    used yesterday's ages. Like every scoring date it derives from
+    date.today(), so all day boundaries agree.
+    """
+    return datetime.combine(today or date.today(), time.min).astimezone()
+
+
+def _years_before(day, years):
+    """``day`` shifted back by whole years; Feb 29 maps to Feb 28 in common years"""
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+def pool_window(target_user, today=None):
+    """
+    Candidate gender and (exclusive, inclusive) date of birth bounds of the
+    candidates the age rules score above 0 for a target
+    """
+    today = today or date.today()
+    target_age = today.year - target_user.date_of_birth.year - (
+        (today.month, today.day) < (target_user.date_of_birth.month, target_user.date_of_birth.day)
+    )
+    youngest, oldest = NONZERO_AGE_DIFFERENCE['male' if target_user.gender == 'male' else 'female']
+
+    opposite_gender = 'female' if target_user.gender == 'male' else 'male'
+    return opposite_gender, _years_before(today, target_age + oldest + 1), _years_before(today, target_age + youngest)
+
+
+def full_candidate_pool(target_user):
+    """Every opposite-gender profile with a date of birth, other than the target"""
+    opposite_gender = 'female' if target_user.gender == 'male' else 'male'
+    return User.objects.filter(gender=opposite_gender, date_of_birth__isnull=False).exclude(id=target_user.id)
+
+
+def candidate_pool(target_user, today=None):
+    """
+    Candidates for a target with the hard constraints pushed into SQL:
+    opposite gender, a date of birth, and an age the age rules score
+    above 0. Backed by the (gender, date_of_birth) index on User.
+    """
+    _, born_after, born_until = pool_window(target_user, today)
+    return full_candidate_pool(target_user).filter(
+        date_of_birth__gt=born_after,
+        date_of_birth__lte=born_until,
+    )
+
+
+def match_list_targets(gender, date_of_birth, today=None):
+    """
+    Assigned users whose candidate_pool includes a profile with this gender
+    and date of birth, i.e. the match lists such a profile can appear in
+    """
+    if gender not in ('male', 'female') or not date_of_birth:
+        return User.objects.none()
+
+    today = today or date.today()
+    age = today.year - date_of_birth.year - ((today.month, today.day) < (date_of_birth.month, date_of_birth.day))
+    if gender == 'female':
+        targets = User.objects.filter(gender='male')
+        youngest, oldest = NONZERO_AGE_DIFFERENCE['male']
+    else:
+        targets = User.objects.exclude(gender='male')
+        youngest, oldest = NONZERO_AGE_DIFFERENCE['female']
+
+    # The profile's age minus the target's must lie within [youngest, oldest]
+    return targets.filter(
+        matchmaker__isnull=False,
+        date_of_birth__gt=_years_before(today, age - youngest + 1),
+        date_of_birth__lte=_years_before(today, age - oldest),
+    )
+
+
+def load_features(users, chunk_size=LOAD_CHUNK_SIZE):
+    """
+    Stream stored FEATURE_FIELDS tuples for a User queryset, ordered by id
+    and skipping profiles without a date of birth. Only the feature columns
+    are fetched, chunk_size rows per round trip. Profiles missing from the
+    store (e.g. bulk-created without signals) are derived and stored first.
+    """
+    missing = users.filter(features__isnull=True)
+    if missing.exists():
+        UserFeatures.refresh(missing.only(*UserFeatures.SOURCE_FIELDS))
+
+    return (
+        UserFeatures.objects.filter(user__in=users, birth_year__isnull=False)
+        .order_by('user_id')
+        .values_list(*STORE_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def match_export_lines(engine, target_user, chunk_size=LOAD_CHUNK_SIZE):
+    """
+    NDJSON export of the scores of a target's whole candidate pool,
+    ordered by candidate id, including the candidates outside the age
+    window (scored 0 for age) that candidate_pool leaves out. Candidates
+    are streamed, scored and written chunk_size at a time; each yielded
+    string holds one chunk's lines.
+    """
+    candidates = load_features(full_candidate_pool(target_user), chunk_size)
+    lines = []
+    for candidate_id, total, scores in BatchScorer(engine).iter_scores(target_user, candidates, chunk_size):
+        lines.append(json.dumps({
+            'user_id': target_user.id,
+            'candidate_id': candidate_id,
+            'compatibility_score': total,
+            'parameter_scores': dict(zip(PARAMETERS, scores.tolist())),
+        }))
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+class ProfileColumns:
+    """Structure-of-arrays view over a batch of encoded profiles"""
+
+    def __init__(self, **columns):
+        for field in FEATURE_FIELDS:
+            setattr(self, field, columns[field])
+        self._ages = self._ages_on = None
+
+    def __len__(self):
+        return len(self.id)
+
+    def ages(self, today):
+        """Ages on ``today``, computed once per columns object"""
+        if self._ages_on != today:
+            self._ages = today.year - self.birth_year - (self.birth_monthday > today.month * 100 + today.day)
+            self._ages_on = today
+        return self._ages
+
+    def take(self, indices):
+        """Columns restricted to the given positions (a slice keeps 1-D shape)"""
+        return ProfileColumns(**{field: getattr(self, field)[indices] for field in FEATURE_FIELDS})
+
+    def as_column(self):
+        """Columns shaped (n, 1), to broadcast against a candidate row into an n x candidates matrix"""
+        return ProfileColumns(**{field: getattr(self, field)[:, np.newaxis] for field in FEATURE_FIELDS})
+
+
+class ProfileEncoder:
+    """
+    Turns feature tuples into ProfileColumns. Categorical values share one
+    vocabulary per encoder, so targets and candidates encoded by the same
+    instance can be compared code-for-code.
+    """
+
+    def __init__(self):
+        self._vocabularies = {field: {} for field in CATEGORICAL_FIELDS}
+
+    def code(self, field, value):
+        if value is None:
+            return -1
+        vocabulary = self._vocabularies[field]
+        return vocabulary.setdefault(value, len(vocabulary))
+
+    def encode(self, rows):
+        rows = list(rows)
+        raw_columns = list(zip(*rows)) if rows else [()] * len(FEATURE_FIELDS)
+
+        columns = {}
+        for field, values in zip(FEATURE_FIELDS, raw_columns):
+            if field in CATEGORICAL_FIELDS:
+                columns[field] = np.fromiter(
+                    (self.code(field, value) for value in values), dtype=np.int32, count=len(values)
+                )
+            else:
+                columns[field] = np.array(values, dtype=FEATURE_DTYPES[field])
+        return ProfileColumns(**columns)
+
+
+class BatchScores:
+    """Parameter scores (PARAMETERS x candidates) and weighted totals for one target"""
+
+    def __init__(self, ids, parameter_scores, totals):
+        self.ids = ids
+        self.parameter_scores = parameter_scores
+        self.totals = totals
+
+    def __len__(self):
+        return len(self.totals)
+
+
+class MutualScores(BatchScores):
+    """BatchScores from the target's side plus the candidates' side and the combined score"""
+
+    def __init__(self, ids, parameter_scores, totals, reverse_totals, mutual_totals):
+        super().__init__(ids, parameter_scores, totals)
+        self.reverse_totals = reverse_totals
+        self.mutual_totals = mutual_totals
+
+
+class TopKSelector:
+    """
+    Streaming top-K by score using a bounded min-heap. Only the K best
+    results seen so far are kept, while every result above the threshold
+    is counted. Ties keep the earliest offered result, like a stable sort.
+    """
+
+    def __init__(self, k=25, threshold=30):
+        self.k = k
+        self.threshold = threshold
+        self.total = 0
+        self._heap = []
+        self._seen = 0
+
+    def push(self, score, item):
+        self._offer(score, self._seen, item)
+        self._seen += 1
+
+    def push_many(self, scores, items):
+        """Offer a batch of NumPy scores with their items, in order"""
+        base = self._seen
+        self._seen += len(scores)
+
+        positions = np.flatnonzero(scores > self.threshold)
+        self.total += len(positions)
+        if self.k and len(self._heap) >= self.k:
+            # Only results at least as good as the current K-th can get in
+            positions = positions[scores[positions] >= self._heap[0][0]]
+        if self.k and len(positions) > self.k:
+            # Nor can results below the K-th best of this batch
+            kth = np.partition(scores[positions], len(positions) - self.k)[len(positions) - self.k]
+            positions = positions[scores[positions] >= kth]
+        for position in positions:
+            self._push_entry(float(scores[position]), base + int(position), items[position])
+
+    def _offer(self, score, sequence, item):
+        if score > self.threshold:
+            self.total += 1
+            self._push_entry(score, sequence, item)
+
+    def _push_entry(self, score, sequence, item):
+        # Min-heap on (score, -sequence): the root is the worst kept result
+        entry = (score, -sequence, item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif self.k and entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def cutoff(self):
+        """Score to beat once K results are kept, else None"""
+        if self.k and len(self._heap) >= self.k:
+            return self._heap[0][0]
+        return None
+
+    def count(self, matches):
+        """Count results known to be above the threshold but not kept"""
+        self.total += matches
+
+    def merge(self, other, offset=0):
+        """Fold in a selector that ran over the items from position ``offset`` on (e.g. one shard)"""
+        self.total += other.total
+        for score, sequence, item in other._heap:
+            self._push_entry(score, offset - sequence, item)
+        self._seen = max(self._seen, offset + other._seen)
+
+    def resolve(self, lookup):
+        """Replace each kept item with ``lookup[item]`` (e.g. ids with full results)"""
+        self._heap = [(score, sequence, lookup[item]) for score, sequence, item in self._heap]
+
+    def results(self):
+        """Kept (score, item) pairs, best first"""
+        return [(score, item) for score, _, item in sorted(self._heap, key=lambda entry: (-entry[0], -entry[1]))]
+
+
+# Slack for float rounding between the pruning bounds (accumulated in
+# evaluation order) and the exact totals (accumulated in PARAMETERS order)
+BOUND_EPSILON = 1e-9
+
+# Candidates per chunk in branch-and-bound mode; the K-th best score from
+# earlier chunks tightens the bound for later ones
+PRUNING_CHUNK_SIZE = 2048
+
+
+def _by_gender(male, male_rule, female_rule):
+    """Evaluate only the rule(s) needed for the target gender(s)"""
+    if male.all():
+        return male_rule()
+    if not male.any():
+        return female_rule()
+    return np.where(male, male_rule(), female_rule())
+
+
+class ScoringRules:
+    """
+    Per-target context shared by the vectorized parameter scorers. Target
+    columns broadcast against candidate columns (length-1 for one target).
+    """
+
+    def __init__(self, engine, encoder, target, today=None):
+        self.target = target
+        self.today = today or date.today()
+        self.target_age = target.ages(self.today)
+
+        # Most rules branch on ``gender == 'male'``; education and career branch on
+        # ``gender == 'female'``, which differs for 'other' and missing genders
+        self.male = np.asarray(target.gender == encoder.code('gender', 'male'))
+        self.not_female = np.asarray(target.gender != encoder.code('gender', 'female'))
+
+        self.no_preference = encoder.code('religion', 'no_preference')
+        self.modern_religions = [encoder.code('religion', religion) for religion in MODERN_RELIGIONS]
+        self.maybe_kids = encoder.code('want_kids', 'maybe')
+        self.maybe_pets = encoder.code('open_to_pets', 'maybe')
+
+        self.weights = {
+            param: np.where(self.male, engine.MALE_WEIGHTS[param], engine.FEMALE_WEIGHTS[param])
+            for param in PARAMETERS
+        }
+        self.total_weights = np.where(self.male, sum(engine.MALE_WEIGHTS.values()), sum(engine.FEMALE_WEIGHTS.values()))
+
+    def contribution(self, param, score):
+        """Share of the weighted total (0-100) contributed by one parameter"""
+        return (self.weights[param] * score) / self.total_weights * 100
+
+    def max_contribution(self, param):
+        return float(np.max(self.contribution(param, 1.0)))
+
+    def weighted_total(self, parameter_scores):
+        """Weighted total, accumulated in the same order as the per-pair formula"""
+        totals = np.zeros(parameter_scores.shape[1:])
+        for index, param in enumerate(PARAMETERS):
+            totals = totals + self.contribution(param, parameter_scores[index])
+        return totals
+
+
+def _score_age(rules, c):
+    age_diff = c.ages(rules.today) - rules.target_age
+    return _by_gender(
+        rules.male,
+        lambda: np.select(
+            [(-5 <= age_diff) & (age_diff <= 0), (-7 <= age_diff) & (age_diff <= 2), (-10 <= age_diff) & (age_diff <= 5)],
+            [1.0, 0.7, 0.4], 0.0,
+        ),
+        lambda: np.select(
+            [(0 <= age_diff) & (age_diff <= 5), (-2 <= age_diff) & (age_diff <= 7), (-3 <= age_diff) & (age_diff <= 10)],
+            [1.0, 0.8, 0.5], 0.0,
+        ),
+    )
+
+
+def _score_income(rules, c):
+    t = rules.target
+    return np.where(
+        ~np.isnan(t.income) & ~np.isnan(c.income),
+        _by_gender(
+            rules.male,
+            lambda: np.select([c.income >= t.income * 0.75, c.income >= t.income * 0.5], [1.0, 0.8], 0.5),
+            lambda: np.select(
+                [c.income >= t.income, c.income >= t.income * 0.9, c.income >= t.income * 0.75],
+                [1.0, 0.8, 0.5], 0.0,
+            ),
+        ),
+        0.5,
+    )
+
+
+def _score_cultural(rules, c):
+    t = rules.target
+    religion_match = (t.religion >= 0) & (c.religion == t.religion)
+    caste_match = (t.caste >= 0) & (c.caste == t.caste)
+    flexible = (t.religion == rules.no_preference) | (c.religion == rules.no_preference)
+    score = np.select(
+        [religion_match & caste_match, religion_match, caste_match, flexible],
+        [1.0, 0.5, 0.3, 0.4], 0.0,
+    )
+    modern = np.isin(t.religion, rules.modern_religions) & np.isin(c.religion, rules.modern_religions)
+    return np.where(modern, np.maximum(score, 0.6), score)
+
+
+def _score_location(rules, c):
+    t = rules.target
+    same_city = (t.city >= 0) & (c.city == t.city)
+    same_country = (t.country >= 0) & (c.country == t.country)
+    relocate = t.relocate | c.relocate
+    return np.select(
+        [same_city & same_country, same_country & relocate, same_country, relocate],
+        [1.0, np.where(rules.male, 0.8, 0.7), 0.6, 0.4], 0.0,
+    )
+
+
+def _score_kids(rules, c):
+    t = rules.target
+    return np.select(
+        [(t.want_kids < 0) | (c.want_kids < 0), c.want_kids == t.want_kids,
+         (t.want_kids == rules.maybe_kids) | (c.want_kids == rules.maybe_kids)],
+        [0.5, 1.0, 0.5], 0.0,
+    )
+
+
+def _score_education(rules, c):
+    t = rules.target
+    return np.where(
+        (t.education_level > 0) & (c.education_level > 0),
+        _by_gender(
+            rules.not_female,
+            lambda: np.select(
+                [np.abs(c.education_level - t.education_level) == 0, np.abs(c.education_level - t.education_level) == 1,
+                 np.abs(c.education_level - t.education_level) <= 2],
+                [1.0, 0.8, 0.5], 0.2,
+            ),
+            lambda: np.select(
+                [c.education_level >= t.education_level, c.education_level == t.education_level - 1],
+                [1.0, 0.5], 0.0,
+            ),
+        ),
+        0.4,
+    )
+
+
+def _score_career(rules, c):
+    t = rules.target
+    return _by_gender(
+        rules.not_female,
+        lambda: np.where(np.abs(c.prestige - t.prestige) <= 0.3, 1.0, 0.6),
+        lambda: np.select([c.prestige >= t.prestige, c.prestige >= t.prestige * 0.8], [1.0, 0.7], 0.3),
+    )
+
+
+def _score_marital(rules, c):
+    return np.where(c.marital_status == rules.target.marital_status, 1.0, 0.5)
+
+
+def _score_siblings(rules, c):
+    t = rules.target
+    sibling_diff = np.abs(c.siblings - t.siblings)
+    return np.select(
+        [(t.siblings < 0) | (c.siblings < 0), sibling_diff == 0, sibling_diff <= 1, sibling_diff <= 2],
+        [0.5, 1.0, 0.8, 0.5], 0.2,
+    )
+
+
+def _score_languages(rules, c):
+    # Popcount of the shared-language mask
+    t = rules.target
+    common = t.languages & c.languages
+    common_count = np.bitwise_count(common)
+    major = (common & np.uint64(MAJOR_LANGUAGE_MASK)) != 0
+    return np.select(
+        [(t.languages == 0) | (c.languages == 0), common_count >= 2, (common_count == 1) & major, common_count == 1],
+        [0.4, 1.0, 0.8, 0.5], 0.0,
+    )
+
+
+def _score_height(rules, c):
+    t = rules.target
+    return np.where(
+        ~np.isnan(t.height) & ~np.isnan(c.height),
+        _by_gender(
+            rules.male,
+            lambda: np.select(
+                [np.abs((t.height - c.height) - 0.08) <= 0.05, np.abs((t.height - c.height) - 0.08) <= 0.10],
+                [1.0, 0.5], 0.0,
+            ),
+            lambda: np.select(
+                [np.abs((c.height - t.height) - 0.21) <= 0.05, np.abs((c.height - t.height) - 0.21) <= 0.10],
+                [1.0, 0.5], 0.0,
+            ),
+        ),
+        0.6,
+    )
+
+
+def _score_pets(rules, c):
+    t = rules.target
+    return np.select(
+        [(t.open_to_pets < 0) | (c.open_to_pets < 0), c.open_to_pets == t.open_to_pets,
+         (t.open_to_pets == rules.maybe_pets) | (c.open_to_pets == rules.maybe_pets)],
+        [0.6, 1.0, 0.5], 0.0,
+    )
+
+
+SCORERS = {
+    'age': _score_age,
+    'income': _score_income,
+    'caste_religion': _score_cultural,
+    'location_relocate': _score_location,
+    'want_kids': _score_kids,
+    'education': _score_education,
+    'company_designation': _score_career,
+    'marital_status': _score_marital,
+    'siblings': _score_siblings,
+    'languages': _score_languages,
+    'height': _score_height,
+    'open_to_pets': _score_pets,
+}
+
+
+def score_columns(engine, encoder, target, candidates, today=None):
+    """
+    Score every target/candidate pair. Returns the parameter score stack in
+    PARAMETERS order and the weighted totals.
+    """
+    rules = ScoringRules(engine, encoder, target, today)
+    scores = [SCORERS[param](rules, candidates) for param in PARAMETERS]
+    shape = np.broadcast_shapes(*(np.shape(score) for score in scores))
+    parameter_scores = np.stack([np.broadcast_to(score, shape) for score in scores]).astype(np.float64)
+    return parameter_scores, rules.weighted_total(parameter_scores)
+
+
+# Rules that are symmetric in the two profiles and ignore the scoring side's
+# gender, so one evaluation serves both directions of a pair
+SYMMETRIC_PARAMETERS = ('caste_religion', 'want_kids', 'marital_status', 'siblings', 'languages', 'open_to_pets')
+
+
+def _harmonic_mean(forward, reverse):
+    total = forward + reverse
+    return np.divide(2 * forward * reverse, total, out=np.zeros(np.shape(total)), where=total > 0)
+
+
+# Ways to merge the two one-sided totals (0-100) into a mutual score
+COMBINERS = {
+    'min': np.minimum,
+    'geometric': lambda forward, reverse: np.sqrt(forward * reverse),
+    'harmonic': _harmonic_mean,
+}
+
+
+def score_mutual(engine, encoder, target, candidates, today=None):
+    """
+    Score both directions of every pair: the target's view of each
+    candidate (forward) and each candidate's view of the target (reverse,
+    with the candidates broadcast as targets against the one target).
+    Symmetric rules and ages are evaluated once. Returns the forward and
+    reverse parameter stacks and totals; each direction equals a separate
+    calculate_comprehensive_score call bit for bit.
+    """
+    forward = ScoringRules(engine, encoder, target, today)
+    reverse = ScoringRules(engine, encoder, candidates, today)
+
+    shape = (len(PARAMETERS),) + np.broadcast_shapes(target.id.shape, candidates.id.shape)
+    forward_scores, reverse_scores = np.empty(shape), np.empty(shape)
+    for index, param in enumerate(PARAMETERS):
+        forward_scores[index] = SCORERS[param](forward, candidates)
+        if param in SYMMETRIC_PARAMETERS:
+            reverse_scores[index] = forward_scores[index]
+        else:
+            reverse_scores[index] = SCORERS[param](reverse, target)
+    return forward_scores, forward.weighted_total(forward_scores), reverse_scores, reverse.weighted_total(reverse_scores)
+
+
+def score_matrix(engine, encoder, targets, candidates, today=None):
+    """
+    Weighted totals of every target (rows) against every candidate
+    (columns), with targets encoded as (m, 1) columns. Candidates whose age
+    scores 0, i.e. outside the target's candidate_pool, and the target
+    itself are set to -inf. Accumulated like weighted_total, so each row
+    equals the single-target totals bit for bit.
+    """
+    rules = ScoringRules(engine, encoder, targets, today)
+    age_scores = SCORERS['age'](rules, candidates)
+    totals = np.zeros(np.broadcast_shapes(targets.id.shape, candidates.id.shape))
+    for param in PARAMETERS:
+        score = age_scores if param == 'age' else SCORERS[param](rules, candidates)
+        totals = totals + rules.contribution(param, score)
+    return np.where((age_scores > 0) & (candidates.id != targets.id), totals, -np.inf)
+
+
+def score_pruned(engine, encoder, target, candidates, rows, selector, today=None):
+    """
+    Branch-and-bound scoring of one target into a TopKSelector. Parameters
+    are evaluated heaviest first and a candidate is dropped as soon as its
+    best possible total cannot pass the threshold, or cannot beat the
+    selector's current K-th best while already being above the threshold
+    (it is then only counted). Survivors get exact totals and the ones the
+    selector keeps become MatchResults built from their feature ``rows``.
+    """
+    rules = ScoringRules(engine, encoder, target, today)
+    order = sorted(PARAMETERS, key=rules.max_contribution, reverse=True)
+
+    alive = np.arange(len(candidates))
+    columns = candidates
+    partial = np.zeros(len(candidates))
+    scores = np.empty((len(PARAMETERS), len(candidates)))
+    remaining = sum(rules.max_contribution(param) for param in PARAMETERS)
+
+    for param in order:
+        score = np.broadcast_to(SCORERS[param](rules, columns), alive.shape)
+        scores[PARAMETERS.index(param)] = score
+        partial = partial + rules.contribution(param, score)
+        remaining -= rules.max_contribution(param)
+        upper = partial + remaining
+
+        drop = upper <= selector.threshold - BOUND_EPSILON
+        cutoff = selector.cutoff()
+        if cutoff is not None:
+            settled = (upper < cutoff - BOUND_EPSILON) & (partial > selector.threshold + BOUND_EPSILON)
+            selector.count(int(np.count_nonzero(settled)))
+            drop |= settled
+
+        if drop.any():
+            keep = ~drop
+            alive, partial, scores = alive[keep], partial[keep], scores[:, keep]
+            columns = columns.take(keep)
+            if not len(alive):
+                return selector
+
+    totals = rules.weighted_total(scores)
+    selector.push_many(totals, _LazyMatches([rows[position] for position in alive], scores, totals))
+    return selector
+
+
+class BatchScorer:
+    """Scores one target against many candidates with a shared ProfileEncoder"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.encoder = ProfileEncoder()
+
+    def score(self, target_user, candidates):
+        """``candidates`` are FEATURE_FIELDS tuples, see load_features"""
+        target = self.encoder.encode([profile_features(target_user)])
+        columns = self.encoder.encode(candidates)
+        parameter_scores, totals = score_columns(self.engine, self.encoder, target, columns)
+        return BatchScores(columns.id, parameter_scores, totals)
+
+    def iter_scores(self, target_user, candidates, chunk_size=LOAD_CHUNK_SIZE):
+        """
+        Yield (candidate id, weighted total, parameter scores) for every
+        candidate of an iterable of FEATURE_FIELDS tuples, scoring
+        chunk_size at a time so memory stays flat for any pool size
+        """
+        target = self.encoder.encode([profile_features(target_user)])
+        candidates = iter(candidates)
+        while chunk := list(islice(candidates, chunk_size)):
+            columns = self.encoder.encode(chunk)
+            parameter_scores, totals = score_columns(self.engine, self.encoder, target, columns)
+            for position, candidate_id in enumerate(columns.id.tolist()):
+                yield candidate_id, float(totals[position]), parameter_scores[:, position]
+
+    def score_mutual(self, target_user, candidates, combiner='geometric'):
+        """Both directions of every pair and their COMBINERS[combiner] score"""
+        target = self.encoder.encode([profile_features(target_user)])
+        columns = self.encoder.encode(candidates)
+        parameter_scores, totals, _, reverse_totals = score_mutual(self.engine, self.encoder, target, columns)
+        return MutualScores(columns.id, parameter_scores, totals, reverse_totals, COMBINERS[combiner](totals, reverse_totals))
+
+    def select_mutual(self, target_user, candidates, selector, combiner='geometric', chunk_size=PRUNING_CHUNK_SIZE):
+        """
+        Top-K by mutual score over an iterable of FEATURE_FIELDS tuples;
+        kept results are MutualMatchResults with the target-side breakdown
+        """
+        combine = COMBINERS[combiner]
+        target = self.encoder.encode([profile_features(target_user)])
+        candidates = iter(candidates)
+        while chunk := list(islice(candidates, chunk_size)):
+            parameter_scores, totals, _, reverse_totals = score_mutual(
+                self.engine, self.encoder, target, self.encoder.encode(chunk)
+            )
+            mutual = combine(totals, reverse_totals)
+            selector.push_many(mutual, _LazyMutualMatches(chunk, parameter_scores, mutual, totals, reverse_totals))
+        return selector
+
+    def results(self, target_user, candidates):
+        """MatchResults for a few FEATURE_FIELDS tuples, keyed by candidate id"""
+        candidates = list(candidates)
+        batch = self.score(target_user, candidates)
+        return {
+            row[0]: MatchResult(CandidateFeatures(*row), float(batch.totals[position]), batch.parameter_scores[:, position].copy())
+            for position, row in enumerate(candidates)
+        }
+
+    def select(self, target_user, candidates, selector, chunk_size=PRUNING_CHUNK_SIZE):
+        """
+        Branch-and-bound top-K over an iterable of FEATURE_FIELDS tuples
+        (e.g. the stream from load_features), encoded chunk by chunk
+        """
+        target = self.encoder.encode([profile_features(target_user)])
+        candidates = iter(candidates)
+        while chunk := list(islice(candidates, chunk_size)):
+            score_pruned(self.engine, self.encoder, target, self.encoder.encode(chunk), chunk, selector)
+        return selector
+
+
+# Target x candidate pairs scored per matrix block, bounding the size of
+# the temporaries in score_matrix
+MATRIX_BLOCK_PAIRS = 1_000_000
+
+
+class MatrixScorer:
+    """
+    Top-K matches for many targets at once. Targets are grouped by the
+    gender of their candidates, each group's candidate pool (the union of
+    its targets' age windows) is loaded and encoded once, and the targets x
+    candidates totals are computed as matrix blocks. Rankings, totals and
+    ties are the same as one BatchScorer run per target.
+    """
+
+    def __init__(self, engine, block_pairs=MATRIX_BLOCK_PAIRS):
+        self.engine = engine
+        self.block_pairs = block_pairs
+
+    def select(self, target_users, k=25, threshold=30, today=None):
+        """TopKSelectors of (score, MatchResult) keyed by target id; targets need a date of birth"""
+        today = today or date.today()
+        groups = {}
+        for target_user in target_users:
+            groups.setdefault(pool_window(target_user, today)[0], []).append(target_user)
+
+        selectors = {}
+        for gender, group in groups.items():
+            windows = [pool_window(target_user, today) for target_user in group]
+            pool = User.objects.filter(
+                gender=gender,
+                date_of_birth__gt=min(window[1] for window in windows),
+                date_of_birth__lte=max(window[2] for window in windows),
+            )
+            rows = list(load_features(pool))
+            selectors.update(self._select_group(group, rows, k, threshold, today))
+        return selectors
+
+    def _select_group(self, group, rows, k, threshold, today):
+        encoder = ProfileEncoder()
+        candidates = encoder.encode(rows)
+        targets = encoder.encode([profile_features(target_user) for target_user in group])
+        block = max(1, self.block_pairs // max(len(rows), 1))
+
+        selectors = {}
+        for start in range(0, len(group), block):
+            block_targets = targets.take(slice(start, start + block))
+            totals = score_matrix(self.engine, encoder, block_targets.as_column(), candidates, today)
+            for row, target_user in enumerate(group[start:start + block]):
+                selector = TopKSelector(k=k, threshold=threshold)
+                selector.push_many(totals[row], range(len(rows)))
+
+                # Parameter breakdowns only for the kept candidates
+                positions = np.array([position for _, position in selector.results()], dtype=np.int64)
+                parameter_scores, _ = score_columns(
+                    self.engine, encoder, block_targets.take(slice(row, row + 1)), candidates.take(positions), today
+                )
+                selector.resolve({
+                    position: MatchResult(
+                        CandidateFeatures(*rows[position]), float(totals[row, position]), parameter_scores[:, index].copy()
+                    )
+                    for index, position in enumerate(positions.tolist())
+                })
+                selectors[target_user.id] = selector
+        return selectors
+
+
+def weights_fingerprint(engine):
+    """Short stable hash of the engine's weight tables"""
+    payload = json.dumps([engine.MALE_WEIGHTS, engine.FEMALE_WEIGHTS], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class MatchScoreCache:
+    """
+    Pairwise weighted totals persisted in MatchScore. An entry is reused
+    while the engine version, weights and scoring day are unchanged; the
+    signals in models.py delete the pairs of edited profiles, so a repeat
+    request only scores candidates that are new or changed.
+    """
+
+    def __init__(self, engine, today=None):
+        self.engine = engine
+        self.today = today or date.today()
+        self.version = engine.VERSION
+        self.weights_hash = weights_fingerprint(engine)
+
+    def _entries(self, target_user):
+        return MatchScore.objects.filter(
+            target=target_user,
+            engine_version=self.version,
+            weights_hash=self.weights_hash,
+            scored_on=self.today,
+        )
+
+    def _score_missing(self, target_user, pool, chunk_size=LOAD_CHUNK_SIZE):
+        """Score and store the pool's pairs without a valid entry, yielding (ids, totals) batches"""
+        missing = load_features(pool.exclude(id__in=self._entries(target_user).values('candidate_id')), chunk_size)
+        for batch_ids, batch_totals in ParallelScorer(self.engine).score_chunks(target_user, missing, chunk_size):
+            self._store(target_user, batch_ids, batch_totals)
+            yield batch_ids, batch_totals
+
+    def page(self, target_user, pool, limit, after=None, threshold=30):
+        """
+        One page of the pool ranked best first, ties by ascending id (the
+        order TopKSelector keeps), read from the cache with a keyset cursor:
+        ``after`` is the (score, candidate id) of the previous page's last
+        entry. Only a pool with uncached pairs is scored first. Returns the
+        page's (candidate id, score) pairs, the number of candidates above
+        the threshold and whether more pages follow.
+        """
+        entries = self._entries(target_user)
+        if pool.exclude(id__in=entries.values('candidate_id')).exists():
+            for _ in self._score_missing(target_user, pool):
+                pass
+
+        ranked = entries.filter(candidate__in=pool, total_score__gt=threshold)
+        total = ranked.count()
+        if after is not None:
+            score, candidate_id = after
+            ranked = ranked.filter(Q(total_score__lt=score) | Q(total_score=score, candidate_id__gt=candidate_id))
+        rows = list(ranked.order_by('-total_score', 'candidate_id').values_list('candidate_id', 'total_score')[:limit + 1])
+        return rows[:limit], total, len(rows) > limit
+
+    def results(self, target_user, candidate_ids):
+        """MatchResults with parameter breakdowns for a few candidates, keyed by id"""
+        rows = UserFeatures.objects.filter(user_id__in=candidate_ids).values_list(*STORE_COLUMNS)
+        return BatchScorer(self.engine).results(target_user, rows)
+
+    def _store(self, target_user, ids, totals):
+        MatchScore.objects.bulk_create(
+            [
+                MatchScore(
+                    target_id=target_user.id,
+                    candidate_id=int(candidate_id),
+                    engine_version=self.version,
+                    weights_hash=self.weights_hash,
+                    scored_on=self.today,
+                    total_score=float(total),
+                )
+                for candidate_id, total in zip(ids, totals)
+            ],
+            update_conflicts=True,
+            unique_fields=['target', 'candidate'],
+            update_fields=['engine_version', 'weights_hash', 'scored_on', 'total_score'],
+        )
+
+    def select(self, target_user, pool, selector):
+        """
+        Top-K of a pool read off the rank index, like the first page():
+        pairs without a valid entry are scored and stored chunk by chunk
+        first, so a repeat request scores nothing and an edit only rescores
+        the edited profile's pairs. Ranking, ties (ascending id) and the
+        total match a full sort of the pool.
+        """
+        entries, total, _ = self.page(target_user, pool, selector.k, threshold=selector.threshold)
+        results = self.results(target_user, [candidate_id for candidate_id, _ in entries])
+        for candidate_id, score in sorted(entries):
+            selector.push(score, results[candidate_id])
+        selector.count(total - len(entries))
+        return selector
+
+
+# Pools smaller than this are scored serially: forking workers costs more
+# than vectorized scoring saves
+PARALLEL_MIN_POOL = 50000
+
+# State inherited copy-on-write by forked scoring workers: (engine, target, rows)
+_FORK_STATE = None
+_FORK_LOCK = threading.Lock()
+
+
+def _select_shard(start, stop, k, threshold):
+    engine, target, rows = _FORK_STATE
+    return BatchScorer(engine).select(target, rows[start:stop], TopKSelector(k=k, threshold=threshold))
+
+
+def _score_shard(start, stop):
+    engine, target, rows = _FORK_STATE
+    batch = BatchScorer(engine).score(target, rows[start:stop])
+    return batch.ids, batch.totals
+
+
+class ParallelScorer:
+    """
+    Spreads one target's candidate pool over forked worker processes. The
+    rows are inherited by the workers instead of pickled; each contiguous
+    shard is scored on its own and only its top-K (or totals) is sent back.
+    One worker, pools below min_pool and platforms without fork run
+    serially. ``workers`` defaults to settings.MATCHING_WORKERS.
+    """
+
+    def __init__(self, engine, workers=None, min_pool=PARALLEL_MIN_POOL):
+        self.engine = engine
+        self.workers = workers or getattr(settings, 'MATCHING_WORKERS', 1)
+        self.min_pool = min_pool
+
+    def _parallel(self, rows):
+        return (
+            self.workers > 1 and len(rows) >= self.min_pool
+            and 'fork' in multiprocessing.get_all_start_methods()
+        )
+
+    def _run(self, target_user, rows, function, *args):
+        """Apply a shard function to every shard; returns (shard start, result) pairs in order"""
+        global _FORK_STATE
+        size = -(-len(rows) // self.workers)
+        shards = [(start, min(start + size, len(rows))) for start in range(0, len(rows), size)]
+
+        with _FORK_LOCK:
+            _FORK_STATE = (self.engine, as_features(target_user), rows)
+            try:
+                with ProcessPoolExecutor(len(shards), mp_context=multiprocessing.get_context('fork')) as executor:
+                    futures = [executor.submit(function, start, stop, *args) for start, stop in shards]
+                    return [(start, future.result()) for (start, _), future in zip(shards, futures)]
+            finally:
+                _FORK_STATE = None
+
+    def select(self, target_user, candidates, selector):
+        """Parallel counterpart of BatchScorer.select; ranking and ties are identical"""
+        if self.workers <= 1:
+            return BatchScorer(self.engine).select(target_user, candidates, selector)
+
+        rows = list(candidates)
+        if not self._parallel(rows):
+            return BatchScorer(self.engine).select(target_user, rows, selector)
+        for start, shard_selector in self._run(target_user, rows, _select_shard, selector.k, selector.threshold):
+            selector.merge(shard_selector, start)
+        return selector
+
+    def score_chunks(self, target_user, candidates, chunk_size=LOAD_CHUNK_SIZE):
+        """Yield (candidate ids, weighted totals) for consecutive chunks of the candidates"""
+        if self.workers > 1:
+            candidates = list(candidates)
+            if self._parallel(candidates):
+                for _, result in self._run(target_user, candidates, _score_shard):
+                    yield result
+                return
+
+        scorer = BatchScorer(self.engine)
+        candidates = iter(candidates)
+        while chunk := list(islice(candidates, chunk_size)):
+            batch = scorer.score(target_user, chunk)
+            yield batch.ids, batch.totals
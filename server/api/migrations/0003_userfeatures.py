@@ -0,0 +1,42 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_remove_user_role_user_matchmaker'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserFeatures',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='features', serialize=False, to='api.user')),
+                ('gender', models.CharField(blank=True, max_length=10, null=True)),
+                ('birth_year', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('birth_monthday', models.PositiveSmallIntegerField(blank=True, help_text='month * 100 + day', null=True)),
+                ('income', models.FloatField(blank=True, null=True)),
+                ('religion', models.CharField(blank=True, max_length=50, null=True)),
+                ('caste', models.CharField(blank=True, max_length=50, null=True)),
+                ('city', models.CharField(blank=True, help_text='Lowercased', max_length=100, null=True)),
+                ('country', models.CharField(blank=True, help_text='Lowercased', max_length=100, null=True)),
+                ('relocate', models.BooleanField(default=False)),
+                ('want_kids', models.CharField(blank=True, max_length=10, null=True)),
+                ('education_level', models.PositiveSmallIntegerField(default=0, help_text='EDUCATION_HIERARCHY level, 0 if unknown')),
+                ('prestige', models.FloatField(default=0.5)),
+                ('marital_status', models.CharField(default='single', max_length=20)),
+                ('siblings', models.IntegerField(default=-1, help_text='-1 if unknown')),
+                ('languages', models.BigIntegerField(default=0, help_text='Bitmask over LANGUAGE_CHOICES')),
+                ('height', models.FloatField(blank=True, null=True)),
+                ('open_to_pets', models.CharField(blank=True, max_length=10, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'User features',
+                'verbose_name_plural': 'User features',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_userfeatures'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['gender', 'date_of_birth'], name='user_gender_dob_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['gender', 'religion', 'caste'], name='user_gender_religion_caste_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['city', 'country'], name='user_city_country_idx'),
+        ),
+    ]
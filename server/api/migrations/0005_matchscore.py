@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_user_match_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('engine_version', models.CharField(max_length=50)),
+                ('weights_hash', models.CharField(max_length=16)),
+                ('scored_on', models.DateField()),
+                ('total_score', models.FloatField()),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.user')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.user')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('target', 'candidate'), name='unique_match_score_pair')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_matchscore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchList',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='match_list', serialize=False, to='api.user')),
+                ('total_matches_found', models.PositiveIntegerField()),
+                ('algorithm_version', models.CharField(max_length=50)),
+                ('matches', models.JSONField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MatchListJob',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='api.user')),
+                ('enqueued_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
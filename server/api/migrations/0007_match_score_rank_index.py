@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_matchlist'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='matchscore',
+            index=models.Index(fields=['target', '-total_score', 'candidate'], name='match_score_rank_idx'),
+        ),
+    ]
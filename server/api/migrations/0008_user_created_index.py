@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_match_score_rank_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['matchmaker', 'created_at', 'id'], name='user_matchmaker_created_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_user_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=200)),
+                ('text_hash', models.CharField(max_length=64)),
+                ('vector', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('model', 'text_hash'), name='unique_cached_embedding')],
+            },
+        ),
+    ]
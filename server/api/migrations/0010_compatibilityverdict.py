@@ -0,0 +1,30 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_cachedembedding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompatibilityVerdict',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_hash', models.CharField(max_length=64)),
+                ('candidate_hash', models.CharField(max_length=64)),
+                ('model', models.CharField(max_length=200)),
+                ('prompt_version', models.CharField(max_length=50)),
+                ('kb_version', models.CharField(max_length=64)),
+                ('compatibility_score', models.FloatField()),
+                ('reason', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('target_hash', 'candidate_hash', 'model', 'prompt_version', 'kb_version'), name='unique_compatibility_verdict')],
+            },
+        ),
+    ]
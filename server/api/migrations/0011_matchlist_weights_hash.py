@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_compatibilityverdict'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchlist',
+            name='weights_hash',
+            field=models.CharField(default='', max_length=16),
+        ),
+    ]
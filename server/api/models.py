@@ -5,7 +5,8 @@ from .constants import *
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.utils import timezone
 from django.dispatch import receiver
 
 
@@ -46,52 +47,10 @@ class AdvancedMatchmakingEngine:
         'open_to_pets': 3
     }
     
-    # Education hierarchy for better matching
-    EDUCATION_HIERARCHY = {
-        # Doctorate/Medical (Level 6)
-        'phd': 6, 'md': 6, 'dm': 6, 'mch': 6, 'ms_medical': 6,
-        
-        # Masters/Professional (Level 5)
-        'mtech': 5, 'me': 5, 'ms': 5, 'mba': 5, 'mba_finance': 5, 
-        'mba_marketing': 5, 'mba_hr': 5, 'mba_operations': 5, 'mba_it': 5,
-        'pgdm': 5, 'msc': 5, 'mcom': 5, 'ma': 5, 'mca': 5, 'llm': 5,
-        'med': 5, 'mpharm': 5, 'mds': 5, 'march': 5, 'mdes': 5,
-        
-        # Professional Bachelor's (Level 4)
-        'mbbs': 4, 'btech': 4, 'be': 4, 'btech_cse': 4, 'btech_ece': 4,
-        'btech_eee': 4, 'btech_mech': 4, 'btech_civil': 4, 'btech_chemical': 4,
-        'btech_it': 4, 'llb': 4, 'bpharm': 4, 'bds': 4, 'barch': 4, 'bvsc': 4,
-        'bca': 4,
-        
-        # Regular Bachelor's (Level 3)
-        'bsc': 3, 'bcom': 3, 'ba': 3, 'bba': 3, 'bcom_honours': 3,
-        'bsc_physics': 3, 'bsc_chemistry': 3, 'bsc_cs': 3, 'bsc_it': 3,
-        'ba_english': 3, 'ba_economics': 3, 'bed': 3, 'bfa': 3,
-        
-        # Diplomas (Level 2)
-        'diploma': 2, 'polytechnic': 2, 'iti': 2,
-        
-        # School (Level 1)
-        '12th': 1,
-        
-        # Generic
-        'graduation': 3, 'postgraduation': 5, 'other': 3
-    }
-    
-    # High-prestige companies for company scoring
-    PRESTIGE_COMPANIES = [
-        'google', 'microsoft', 'apple', 'amazon', 'meta', 'netflix', 'tesla',
-        'goldman sachs', 'jp morgan', 'morgan stanley', 'blackrock',
-        'mckinsey', 'bain', 'bcg', 'deloitte', 'pwc', 'kpmg', 'ey',
-        'tcs', 'infosys', 'wipro', 'hcl', 'tech mahindra', 'cognizant',
-        'reliance', 'tata', 'adani', 'bajaj', 'mahindra', 'birla'
-    ]
-    
-    # Senior designations
-    SENIOR_DESIGNATIONS = [
-        'director', 'vp', 'vice president', 'ceo', 'cto', 'cfo', 'founder',
-        'co-founder', 'head', 'lead', 'principal', 'senior manager', 'manager'
-    ]
+    # Lookup tables shared with UserFeatures.derive, see constants.py
+    EDUCATION_HIERARCHY = EDUCATION_HIERARCHY
+    PRESTIGE_COMPANIES = PRESTIGE_COMPANIES
+    SENIOR_DESIGNATIONS = SENIOR_DESIGNATIONS
 
 
 
@@ -203,6 +162,14 @@ class User(models.Model):
     class Meta:
         verbose_name = "User"
         verbose_name_plural = "Users"
+        indexes = [
+            # Candidate prefiltering for matches
+            models.Index(fields=['gender', 'date_of_birth'], name='user_gender_dob_idx'),
+            models.Index(fields=['gender', 'religion', 'caste'], name='user_gender_religion_caste_idx'),
+            models.Index(fields=['city', 'country'], name='user_city_country_idx'),
+            # Users list pages, keyset on (created_at, id)
+            models.Index(fields=['matchmaker', 'created_at', 'id'], name='user_matchmaker_created_idx'),
+        ]
 
 
 class Language(models.Model):
@@ -217,6 +184,135 @@ class Language(models.Model):
         verbose_name_plural = "Languages"
 
 
+def language_mask(names):
+    """Encode an iterable of language codes as a bitmask over LANGUAGE_CHOICES"""
+    mask = 0
+    for name in names:
+        mask |= LANGUAGE_BITS.get(name, 0)
+    return mask
+
+
+def language_masks(users):
+    """
+    Language bitmask per user id for a User queryset (or ids), read from the
+    M2M through table in a single query instead of one per profile
+    """
+    masks = {}
+    rows = User.languages_known.through.objects.filter(user__in=users).values_list('user_id', 'language__name')
+    for user_id, name in rows:
+        masks[user_id] = masks.get(user_id, 0) | LANGUAGE_BITS.get(name, 0)
+    return masks
+
+
+class UserFeatures(models.Model):
+    """
+    Denormalized matching inputs for a User, derived once when the profile
+    or its languages change so scoring never re-derives them per request.
+    Kept in sync by the signal handlers below; rebuild everything with
+    `python manage.py rebuild_user_features` after bulk updates.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='features')
+    gender = models.CharField(max_length=10, null=True, blank=True)
+    
+    # Date of birth split up so ages can be computed for any day in bulk
+    birth_year = models.PositiveSmallIntegerField(null=True, blank=True)
+    birth_monthday = models.PositiveSmallIntegerField(null=True, blank=True, help_text="month * 100 + day")
+    
+    income = models.FloatField(null=True, blank=True)
+    religion = models.CharField(max_length=50, null=True, blank=True)
+    caste = models.CharField(max_length=50, null=True, blank=True)
+    city = models.CharField(max_length=100, null=True, blank=True, help_text="Lowercased")
+    country = models.CharField(max_length=100, null=True, blank=True, help_text="Lowercased")
+    relocate = models.BooleanField(default=False)
+    want_kids = models.CharField(max_length=10, null=True, blank=True)
+    education_level = models.PositiveSmallIntegerField(default=0, help_text="EDUCATION_HIERARCHY level, 0 if unknown")
+    prestige = models.FloatField(default=0.5)
+    marital_status = models.CharField(max_length=20, default='single')
+    siblings = models.IntegerField(default=-1, help_text="-1 if unknown")
+    languages = models.BigIntegerField(default=0, help_text="Bitmask over LANGUAGE_CHOICES")
+    height = models.FloatField(null=True, blank=True)
+    open_to_pets = models.CharField(max_length=10, null=True, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # User columns read by derive(); load users with .only(*SOURCE_FIELDS)
+    SOURCE_FIELDS = (
+        'gender', 'date_of_birth', 'income', 'religion', 'caste', 'city', 'country',
+        'open_to_relocate', 'want_kids', 'degree', 'current_company', 'designation',
+        'marital_status', 'siblings', 'height', 'open_to_pets',
+    )
+    
+    @classmethod
+    def derive(cls, user, languages=None):
+        """Build (without saving) the features of a user"""
+        if languages is None:
+            languages = language_mask(lang.name for lang in user.languages_known.all())
+        
+        dob = user.date_of_birth
+        return cls(
+            user=user,
+            gender=user.gender or None,
+            birth_year=dob.year if dob else None,
+            birth_monthday=dob.month * 100 + dob.day if dob else None,
+            income=float(user.income) if user.income else None,
+            religion=user.religion or None,
+            caste=user.caste or None,
+            city=user.city.lower() if user.city else None,
+            country=user.country.lower() if user.country else None,
+            relocate=user.open_to_relocate == 'yes',
+            want_kids=user.want_kids or None,
+            education_level=EDUCATION_HIERARCHY.get(user.degree, 3) if user.degree else 0,
+            prestige=cls._career_prestige(user),
+            marital_status=user.marital_status or 'single',
+            siblings=-1 if user.siblings is None else user.siblings,
+            languages=languages,
+            height=user.height if user.height else None,
+            open_to_pets=user.open_to_pets or None,
+        )
+    
+    @staticmethod
+    def _career_prestige(user):
+        """Career prestige: 0.5 base, +0.3 for a prestige company, +0.2 for a senior role"""
+        prestige = 0.5
+        
+        if user.current_company:
+            company_lower = user.current_company.lower()
+            if any(prestige_co in company_lower for prestige_co in PRESTIGE_COMPANIES):
+                prestige += 0.3
+        
+        if user.designation:
+            designation_lower = user.designation.lower()
+            if any(senior_des in designation_lower for senior_des in SENIOR_DESIGNATIONS):
+                prestige += 0.2
+        
+        return min(prestige, 1.0)
+    
+    @classmethod
+    def refresh(cls, users):
+        """Recompute and upsert the features of the given users"""
+        users = list(users)
+        if not users:
+            return
+        
+        masks = language_masks([user.id for user in users])
+        features = [cls.derive(user, masks.get(user.id, 0)) for user in users]
+        update_fields = [field.name for field in cls._meta.concrete_fields if not field.primary_key]
+        cls.objects.bulk_create(features, update_conflicts=True, unique_fields=['user'], update_fields=update_fields)
+    
+    class Meta:
+        verbose_name = "User features"
+        verbose_name_plural = "User features"
+
+
+@receiver(post_save, sender=MatchMaker)
+@receiver(post_delete, sender=MatchMaker)
+def invalidate_cached_principal(sender, instance, **kwargs):
+    """Authenticate the next request of an edited or deleted matchmaker from the database"""
+    from .utils import principal_cache
+    
+    principal_cache.invalidate(instance.id)
+
+
 @receiver(post_save, sender=MatchMaker)
 def assign_users_to_new_matchmaker_bulk(sender, instance, created, **kwargs):
     """
@@ -233,4 +329,223 @@ def assign_users_to_new_matchmaker_bulk(sender, instance, created, **kwargs):
         # Bulk update for better performance
         if unassigned_users:
             User.objects.bulk_update(unassigned_users, ['matchmaker'])
-            print(f"Assigned {len(unassigned_users)} users to MatchMaker: {instance.username}")
\ No newline at end of file
+            print(f"Assigned {len(unassigned_users)} users to MatchMaker: {instance.username}")
+
+
+class MatchScore(models.Model):
+    """
+    Cached weighted total for a (target, candidate) pair. A row is only
+    valid for the engine version, weights fingerprint and day it was scored
+    with (ages change daily). Profile or language edits delete every pair
+    involving the user, so only those pairs get rescored.
+    """
+    target = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    candidate = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    engine_version = models.CharField(max_length=50)
+    weights_hash = models.CharField(max_length=16)
+    scored_on = models.DateField()
+    total_score = models.FloatField()
+    
+    @classmethod
+    def invalidate(cls, user_ids):
+        """Drop every cached pair involving the given users"""
+        user_ids = list(user_ids)
+        if user_ids:
+            cls.objects.filter(models.Q(target_id__in=user_ids) | models.Q(candidate_id__in=user_ids)).delete()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['target', 'candidate'], name='unique_match_score_pair'),
+        ]
+        indexes = [
+            # Ranked pages: keyset pagination on (score desc, candidate id)
+            models.Index(fields=['target', '-total_score', 'candidate'], name='match_score_rank_idx'),
+        ]
+
+
+class MatchList(models.Model):
+    """
+    Materialized top matches of an assigned user, in the shape served by
+    the matches endpoint. Recomputed from MatchListJob by the
+    materialize_matches worker, or synchronously with ?fresh=1. A list is
+    outdated once the day, engine version or weights it was computed with
+    change.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='match_list')
+    total_matches_found = models.PositiveIntegerField()
+    algorithm_version = models.CharField(max_length=50)
+    weights_hash = models.CharField(max_length=16, default='')
+    matches = models.JSONField()
+    computed_at = models.DateTimeField()
+    
+    @classmethod
+    def store(cls, user, computed_at, **payload):
+        match_list = cls(user=user, computed_at=computed_at, **payload)
+        cls.objects.bulk_create(
+            [match_list], update_conflicts=True, unique_fields=['user'],
+            update_fields=['total_matches_found', 'algorithm_version', 'weights_hash', 'matches', 'computed_at'],
+        )
+        return match_list
+    
+    @classmethod
+    def outdated(cls, version, weights_hash, day_start):
+        """Lists computed before day_start or with another engine version or weights"""
+        return cls.objects.filter(
+            models.Q(computed_at__lt=day_start) | ~models.Q(algorithm_version=version) | ~models.Q(weights_hash=weights_hash)
+        )
+    
+    def is_outdated(self, version, weights_hash, day_start):
+        return (
+            self.computed_at < day_start or self.algorithm_version != version or self.weights_hash != weights_hash
+        )
+
+
+class MatchListJob(models.Model):
+    """
+    Pending match list recomputation for one user. Enqueueing an already
+    queued user only moves enqueued_at forward, so a job re-enqueued while
+    it is being computed survives complete().
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    enqueued_at = models.DateTimeField(db_index=True)
+    
+    @classmethod
+    def enqueue(cls, user_ids):
+        now = timezone.now()
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, enqueued_at=now) for user_id in set(user_ids)],
+            update_conflicts=True, unique_fields=['user'], update_fields=['enqueued_at'],
+        )
+    
+    @classmethod
+    def complete(cls, user_ids, started_at):
+        """Drop the jobs a computation that started at started_at has covered"""
+        cls.objects.filter(user_id__in=user_ids, enqueued_at__lte=started_at).delete()
+
+
+class CachedEmbedding(models.Model):
+    """
+    Pooled float32 embedding of a text, addressed by embedding model and the
+    text's sha256. The persistent tier of api.llm.embeddings.EmbeddingCache;
+    the oldest rows are evicted past EMBEDDING_CACHE_MAX_ENTRIES.
+    """
+    model = models.CharField(max_length=200)
+    text_hash = models.CharField(max_length=64)
+    vector = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    @classmethod
+    def lookup(cls, model, text_hashes):
+        """Stored vectors (as bytes) by text hash"""
+        return dict(cls.objects.filter(model=model, text_hash__in=text_hashes).values_list('text_hash', 'vector'))
+    
+    @classmethod
+    def store(cls, model, vectors, max_entries):
+        """Insert {text hash: vector bytes} and evict the oldest rows beyond max_entries"""
+        cls.objects.bulk_create(
+            [cls(model=model, text_hash=text_hash, vector=vector) for text_hash, vector in vectors.items()],
+            ignore_conflicts=True,
+        )
+        excess = cls.objects.count() - max_entries
+        if excess > 0:
+            oldest = cls.objects.order_by('created_at', 'id').values_list('id', flat=True)[:excess]
+            cls.objects.filter(id__in=list(oldest)).delete()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'text_hash'], name='unique_cached_embedding'),
+        ]
+
+
+class CompatibilityVerdict(models.Model):
+    """
+    Parsed LLM compatibility verdict for a pair of profile versions, see
+    api.llm.verdicts.VerdictCache. Profile edits change the hashes, so the
+    verdicts of outdated profiles are simply never looked up again.
+    """
+    target_hash = models.CharField(max_length=64)
+    candidate_hash = models.CharField(max_length=64)
+    model = models.CharField(max_length=200)
+    prompt_version = models.CharField(max_length=50)
+    kb_version = models.CharField(max_length=64)
+    compatibility_score = models.FloatField()
+    reason = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['target_hash', 'candidate_hash', 'model', 'prompt_version', 'kb_version'],
+                name='unique_compatibility_verdict',
+            ),
+        ]
+
+
+def enqueue_match_lists(user, previous=None):
+    """
+    Queue recomputation of every match list a profile can appear in: its
+    own, if assigned, and those of the targets whose candidate pool
+    includes it before (``previous`` gender and date of birth) or after
+    the edit.
+    """
+    from .matching import match_list_targets
+    
+    targets = match_list_targets(user.gender, user.date_of_birth)
+    if previous and previous != (user.gender, user.date_of_birth):
+        targets = targets | match_list_targets(*previous)
+    user_ids = list(targets.values_list('id', flat=True))
+    if user.matchmaker_id:
+        user_ids.append(user.id)
+    if user_ids:
+        MatchListJob.enqueue(user_ids)
+
+
+@receiver(pre_save, sender=User)
+def remember_match_list_state(sender, instance, raw=False, **kwargs):
+    """Keep the pre-edit gender and date of birth for enqueue_match_lists"""
+    if not raw and instance.pk:
+        instance._match_list_state = User.objects.filter(pk=instance.pk).values_list('gender', 'date_of_birth').first()
+
+
+@receiver(post_save, sender=User)
+def refresh_user_features(sender, instance, raw=False, **kwargs):
+    """Keep the matching feature store and score cache in sync with profile edits"""
+    if not raw:
+        UserFeatures.refresh([instance])
+        MatchScore.invalidate([instance.id])
+        enqueue_match_lists(instance, getattr(instance, '_match_list_state', None))
+
+
+@receiver(post_delete, sender=User)
+def enqueue_match_lists_on_delete(sender, instance, **kwargs):
+    """Lists the deleted profile could appear in must be recomputed without it"""
+    from .matching import match_list_targets
+    
+    MatchListJob.enqueue(match_list_targets(instance.gender, instance.date_of_birth).values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=User.languages_known.through)
+def refresh_user_features_on_languages(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep the language bitmask and score cache in sync from either side of the
+    relation, and bump updated_at since languages are part of a user's data
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            User.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+            UserFeatures.refresh([instance])
+            MatchScore.invalidate([instance.id])
+            enqueue_match_lists(instance)
+        return
+    
+    # instance is a Language: refresh the users that gained or lost it
+    if action == 'pre_clear':
+        instance._cleared_user_ids = list(instance.user_set.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        user_ids = pk_set if action != 'post_clear' else getattr(instance, '_cleared_user_ids', [])
+        User.objects.filter(pk__in=user_ids).update(updated_at=timezone.now())
+        users = list(User.objects.filter(pk__in=user_ids))
+        UserFeatures.refresh(users)
+        MatchScore.invalidate(user_ids)
+        for user in users:
+            enqueue_match_lists(user)
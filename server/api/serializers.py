@@ -1,6 +1,10 @@
+from datetime import date
+from decimal import Decimal
+
 from rest_framework import serializers
 from .models import MatchMaker, User
 from django.contrib.auth import authenticate
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
 
@@ -81,6 +85,88 @@ class UserSerializer(serializers.ModelSerializer):
             }
         return None
     
+class FastUserSerializer:
+    """
+    Read-only stand-in for UserSerializer that renders values() rows directly,
+    skipping model instances and per-field to_representation calls. Produces the
+    same JSON; takes a User queryset and exposes .data like a DRF serializer.
+    """
+    VALUE_FIELDS = [
+        'id', 'first_name', 'last_name', 'gender', 'date_of_birth', 'matchmaker', 'matchmaker__username',
+        'country', 'city', 'height', 'email', 'phone_number', 'undergraduate_college', 'degree', 'income',
+        'current_company', 'designation', 'marital_status', 'siblings', 'caste', 'religion', 'want_kids',
+        'open_to_relocate', 'open_to_pets', 'created_at', 'updated_at',
+    ]
+    INCOME_QUANTUM = Decimal(1).scaleb(-User._meta.get_field('income').decimal_places)
+
+    def __init__(self, queryset, many=False):
+        self.queryset = queryset
+        self.many = many
+
+    @property
+    def data(self):
+        rows = list(self.queryset.prefetch_related(None).values(*self.VALUE_FIELDS))
+        if not self.many and not rows:
+            raise User.DoesNotExist("User matching query does not exist.")
+
+        languages = {row['id']: [] for row in rows}
+        links = User.languages_known.through.objects.filter(user_id__in=languages).order_by('user_id', 'language_id')
+        for user_id, language_id in links.values_list('user_id', 'language_id'):
+            languages[user_id].append(language_id)
+
+        today = date.today()
+        data = [self.to_representation(row, languages[row['id']], today) for row in rows]
+        return data if self.many else data[0]
+
+    @classmethod
+    def to_representation(cls, row, languages, today):
+        dob = row['date_of_birth']
+        income = row['income']
+        height = row['height']
+        matchmaker = row['matchmaker']
+        data = {
+            'id': row['id'],
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'gender': row['gender'],
+            'date_of_birth': dob.isoformat() if dob is not None else None,
+            'matchmaker': matchmaker,
+            'matchmaker_info': {'id': matchmaker, 'username': row['matchmaker__username']} if matchmaker is not None else None,
+            'country': row['country'],
+            'city': row['city'],
+            'height': float(height) if height is not None else None,
+            'email': row['email'],
+            'phone_number': row['phone_number'],
+            'undergraduate_college': row['undergraduate_college'],
+            'degree': row['degree'],
+            'income': '{:f}'.format(income.quantize(cls.INCOME_QUANTUM)) if income is not None else None,
+            'current_company': row['current_company'],
+            'designation': row['designation'],
+            'marital_status': row['marital_status'],
+            'languages_known': languages,
+            'siblings': row['siblings'],
+            'caste': row['caste'],
+            'religion': row['religion'],
+            'want_kids': row['want_kids'],
+            'open_to_relocate': row['open_to_relocate'],
+            'open_to_pets': row['open_to_pets'],
+            'created_at': cls._datetime(row['created_at']),
+            'updated_at': cls._datetime(row['updated_at']),
+        }
+        # UserSerializer skips age when the property fails on a missing date of birth
+        if dob is not None:
+            data['age'] = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+        return data
+
+    @staticmethod
+    def _datetime(value):
+        """ISO 8601 in the current time zone, UTC as 'Z', as DRF renders it"""
+        if value is None:
+            return None
+        value = timezone.localtime(value).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
 class MatchSerializer(serializers.ModelSerializer):
     match_score = serializers.FloatField(read_only=True)
     compatibility_reasons = serializers.ListField(read_only=True)
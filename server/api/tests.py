@@ -1,3 +1,842 @@
 from django.test import TestCase
 
 # Create your tests here.
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import date
+from unittest import mock
+
+import numpy as np
+
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from .matching import (
+    FEATURE_FIELDS, PARAMETERS, PRUNING_CHUNK_SIZE, BatchScorer, CandidateFeatures, ParallelScorer, TopKSelector,
+)
+from .constants import LANGUAGE_BITS
+from .models import CachedEmbedding, Language, MatchList, MatchListJob, MatchMaker, MatchScore, User, UserFeatures
+from .views import AdvancedMatchmakingEngine
+from .utils import generate_jwt_tokens, get_user_from_token
+
+
+def authenticated_client(matchmaker):
+    """API client of a matchmaker whose principal is already cached, so requests skip the auth query"""
+    client = APIClient()
+    token = generate_jwt_tokens(matchmaker)
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    get_user_from_token(token)
+    return client
+
+
+def create_profile(matchmaker, gender, index, languages=()):
+    user = User.objects.create(
+        first_name=f"{gender}{index}",
+        last_name="Test",
+        gender=gender,
+        date_of_birth=date(1994, 1, 1 + index % 28),
+        matchmaker=matchmaker,
+        country="India",
+        city="Mumbai",
+        height=1.60 if gender == 'female' else 1.80,
+        email=f"{gender}{index}@example.com",
+        degree='btech',
+        income=1000000 + index,
+        current_company="Google",
+        designation="Engineer",
+        marital_status='single',
+        siblings=1,
+        caste='brahmin',
+        religion='hinduism',
+        want_kids='yes',
+        open_to_relocate='yes',
+        open_to_pets='maybe',
+    )
+    user.languages_known.set(languages)
+    return user
+
+
+def random_feature_rows(rng, count, gender, first_id=1):
+    """FEATURE_FIELDS tuples of varied profiles, with missing values and the special religions"""
+    def choice(values):
+        return values[rng.integers(len(values))]
+
+    return [
+        (
+            first_id + offset,
+            gender,
+            int(rng.integers(1982, 2004)),
+            int(rng.integers(1, 13)) * 100 + int(rng.integers(1, 29)),
+            choice([None, 400000.0, 800000.0, 1000000.0, 1500000.0, 3000000.0]),
+            choice([None, 'hinduism', 'islam', 'sikhism', 'no_preference', 'atheist', 'agnostic', 'spiritual']),
+            choice([None, 'brahmin', 'rajput', 'jat']),
+            choice([None, 'mumbai', 'delhi', 'pune']),
+            choice([None, 'india', 'usa']),
+            bool(rng.integers(2)),
+            choice([None, 'yes', 'no', 'maybe']),
+            int(rng.integers(0, 7)),
+            choice([0.5, 0.7, 0.8, 1.0]),
+            choice(['single', 'divorced']),
+            int(rng.integers(-1, 5)),
+            int(rng.integers(0, 16)),
+            choice([None, 1.55, 1.65, 1.75, 1.85]),
+            choice([None, 'yes', 'no', 'maybe']),
+        )
+        for offset in range(count)
+    ]
+
+
+def feature_target(gender, **overrides):
+    """A target profile as a CandidateFeatures record"""
+    fields = dict(
+        id=0, gender=gender, birth_year=1994, birth_monthday=101, income=1000000.0, religion='hinduism',
+        caste='brahmin', city='mumbai', country='india', relocate=False, want_kids='yes', education_level=4,
+        prestige=0.8, marital_status='single', siblings=1, languages=3, height=1.8, open_to_pets='maybe',
+    )
+    fields.update(overrides)
+    return CandidateFeatures(*(fields[field] for field in FEATURE_FIELDS))
+
+
+class MatchesQueryCountTest(TestCase):
+    """The matches endpoint must not issue queries per candidate"""
+
+    def setUp(self):
+        self.matchmaker = MatchMaker.objects.create(username="matchmaker")
+        self.client = authenticated_client(self.matchmaker)
+        self.languages = [Language.objects.create(name=name) for name in ('hindi', 'english', 'tamil')]
+        self.target = create_profile(self.matchmaker, 'male', 0, self.languages[:2])
+
+    def _get_matches(self, **params):
+        return self.client.get('/api/v1/matches/', {'id': self.target.id, **params})
+
+    def test_query_count_is_constant(self):
+        for count in (3, 40):
+            for index in range(User.objects.filter(gender='female').count(), count):
+                create_profile(self.matchmaker, 'female', index, self.languages[index % 3:])
+
+            # target, pool ETag state, target languages, uncached check, store check, uncached features,
+            # score upsert, count, top 25, top-25 features, profiles and languages, list upsert, job completion
+            with self.assertNumQueries(14):
+                response = self._get_matches(fresh=1)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['total_matches_found'], count)
+            self.assertEqual(len(response.data['matches']), min(count, 25))
+            self.assertFalse(response.data['recompute_pending'])
+
+            # Without ?fresh the materialized list is served: target, pool ETag state, list
+            with self.assertNumQueries(3):
+                self.assertEqual(self._get_matches().data, response.data)
+
+
+class MatchesConditionalTest(TestCase):
+    """Unchanged matches are revalidated with a 304 before any scoring"""
+
+    def setUp(self):
+        self.matchmaker = MatchMaker.objects.create(username="matchmaker")
+        self.client = authenticated_client(self.matchmaker)
+        self.target = create_profile(self.matchmaker, 'male', 0)
+        self.candidates = [create_profile(None, 'female', index) for index in range(1, 6)]
+
+    def _get_matches(self, etag=None, **params):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/api/v1/matches/', {'id': self.target.id, **params}, **headers)
+
+    def test_unchanged_matches_are_not_modified(self):
+        response = self._get_matches()
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotEqual(self._get_matches(limit=2)['ETag'], etag)
+
+        # target, pool ETag state
+        with self.assertNumQueries(2):
+            self.assertEqual(self._get_matches(etag).status_code, 304)
+
+        self.candidates[0].income = 1
+        self.candidates[0].save()
+        response = self._get_matches(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['recompute_pending'])
+        self.assertNotIn('ETag', response)
+
+        response = self._get_matches(fresh=1)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self._get_matches(response['ETag']).status_code, 304)
+
+
+class UserFeaturesTest(TestCase):
+    """The feature store follows profile and language edits from every entry point"""
+
+    def setUp(self):
+        self.matchmaker = MatchMaker.objects.create(username="matchmaker")
+        self.hindi, self.english = (Language.objects.create(name=name) for name in ('hindi', 'english'))
+        self.user = create_profile(self.matchmaker, 'female', 1, [self.hindi])
+
+    def _features(self):
+        return UserFeatures.objects.get(user=self.user)
+
+    def test_refreshed_on_every_change(self):
+        self.assertEqual(self._features().languages, LANGUAGE_BITS['hindi'])
+
+        self.user.city = "Pune"
+        self.user.save()
+        self.assertEqual(self._features().city, 'pune')
+
+        self.user.languages_known.add(self.english)
+        self.assertEqual(self._features().languages, LANGUAGE_BITS['hindi'] | LANGUAGE_BITS['english'])
+
+        self.hindi.user_set.remove(self.user)
+        self.assertEqual(self._features().languages, LANGUAGE_BITS['english'])
+        self.english.user_set.clear()
+        self.assertEqual(self._features().languages, 0)
+        self.hindi.user_set.add(self.user)
+        self.assertEqual(self._features().languages, LANGUAGE_BITS['hindi'])
+
+        User.objects.filter(id=self.user.id).update(religion='islam', degree='phd')
+        self.assertEqual(self._features().religion, 'hinduism')
+        call_command('rebuild_user_features', '--chunk-size', '1', stdout=io.StringIO())
+        features = self._features()
+        self.assertEqual((features.religion, features.education_level), ('islam', 6))
+
+
+class MatchScoreCacheTest(TestCase):
+    """Profile edits must only invalidate the pairs involving that profile"""
+
+    def setUp(self):
+        self.matchmaker = MatchMaker.objects.create(username="matchmaker")
+        self.client = authenticated_client(self.matchmaker)
+        self.languages = [Language.objects.create(name=name) for name in ('hindi', 'english')]
+        self.target = create_profile(self.matchmaker, 'male', 0, self.languages)
+        self.candidates = [create_profile(self.matchmaker, 'female', index, self.languages) for index in range(5)]
+
+    def _cached_ids(self):
+        return set(MatchScore.objects.filter(target=self.target).values_list('candidate_id', flat=True))
+
+    def _get_page(self):
+        return self.client.get('/api/v1/matches/', {'id': self.target.id, 'limit': 25, 'detail': 1})
+
+    def test_edits_invalidate_only_affected_pairs(self):
+        self._get_page()
+        self.assertEqual(self._cached_ids(), {candidate.id for candidate in self.candidates})
+
+        edited = self.candidates[0]
+        edited.income = 1
+        edited.save()
+        self.candidates[1].languages_known.remove(self.languages[0])
+        self.assertEqual(self._cached_ids(), {candidate.id for candidate in self.candidates[2:]})
+
+        response = self._get_page()
+        self.assertEqual(self._cached_ids(), {candidate.id for candidate in self.candidates})
+        scores = {match['id']: match['compatibility_score'] for match in response.data['matches']}
+        self.assertLess(scores[edited.id], scores[self.candidates[2].id])
+
+        self.target.save()
+        self.assertEqual(self._cached_ids(), set())
+
+    def test_repeat_lists_only_score_edited_pairs(self):
+        with mock.patch('api.matching.BatchScorer.score', autospec=True, side_effect=BatchScorer.score) as score:
+            first = self.client.get('/api/v1/matches/', {'id': self.target.id, 'fresh': 1}).data
+            self.assertEqual(self._cached_ids(), {candidate.id for candidate in self.candidates})
+            # Pool scored once, top matches rescored for their breakdown
+            self.assertEqual([len(call.args[2]) for call in score.call_args_list], [5, 5])
+
+            score.reset_mock()
+            again = self.client.get('/api/v1/matches/', {'id': self.target.id, 'fresh': 1}).data
+            self.assertEqual(again['matches'], first['matches'])
+            self.assertEqual([len(call.args[2]) for call in score.call_args_list], [5])
+
+            self.candidates[0].income = 1
+            self.candidates[0].save()
+            score.reset_mock()
+            self.client.get('/api/v1/matches/', {'id': self.target.id, 'fresh': 1})
+            self.assertEqual([len(call.args[2]) for call in score.call_args_list], [1, 5])
+
+    def test_rebuild_after_bulk_update_invalidates_scores(self):
+        self._get_page()
+        edited = self.candidates[0]
+        User.objects.filter(id=edited.id).update(want_kids='no', religion='islam')
+        call_command('rebuild_user_features', stdout=io.StringIO())
+        self.assertEqual(self._cached_ids(), set())
+        self.assertIn(self.target.id, MatchListJob.objects.values_list('user_id', flat=True))
+
+        response = self._get_page()
+        scores = {match['id']: match['compatibility_score'] for match in response.data['matches']}
+        cached = MatchScore.objects.get(target=self.target, candidate=edited).total_score
+        self.assertLess(scores[edited.id], scores[self.candidates[1].id])
+        self.assertAlmostEqual(cached, scores[edited.id], places=1)
+
+
+class MatchListTest(TestCase):
+    """Profile edits queue the match lists they affect for the worker"""
+
+    def setUp(self):
+        self.matchmaker = MatchMaker.objects.create(username="matchmaker")
+        self.client = authenticated_client(self.matchmaker)
+        self.target = create_profile(self.matchmaker, 'male', 0)
+        self.candidate = create_profile(None, 'female', 1)
+        self.unrelated = create_profile(self.matchmaker, 'male', 2)
+        self.unrelated.date_of_birth = date(1950, 1, 1)
+        self.unrelated.save()
+        call_command('materialize_matches', '--all', '--once', stdout=io.StringIO())
+
+    def _queued_ids(self):
+        return set(MatchListJob.objects.values_list('user_id', flat=True))
+
+    def test_edit_enqueues_affected_lists_and_worker_recomputes(self):
+        self.assertEqual(self._queued_ids(), set())
+        self.assertEqual(MatchList.objects.get(user=self.target).total_matches_found, 1)
+
+        self.candidate.date_of_birth = date(1960, 1, 1)
+        self.candidate.save()
+        # Listed before the edit, in the unrelated target's window after it
+        self.assertEqual(self._queued_ids(), {self.target.id, self.unrelated.id})
+
+        response = self.client.get('/api/v1/matches/', {'id': self.target.id})
+        self.assertTrue(response.data['recompute_pending'])
+        self.assertEqual(response.data['total_matches_found'], 1)
+
+        call_command('materialize_matches', '--once', stdout=io.StringIO())
+        self.assertEqual(self._queued_ids(), set())
+        response = self.client.get('/api/v1/matches/', {'id': self.target.id})
+        self.assertFalse(response.data['recompute_pending'])
+        self.assertEqual(response.data['total_matches_found'], 0)
+        self.assertEqual(MatchList.objects.get(user=self.unrelated).total_matches_found, 1)
+
+    def test_lists_of_another_engine_are_outdated(self):
+        stored = MatchList.objects.get(user=self.target)
+        with mock.patch.dict(AdvancedMatchmakingEngine.MALE_WEIGHTS, {'age': 30}):
+            response = self.client.get('/api/v1/matches/', {'id': self.target.id})
+            self.assertTrue(response.data['recompute_pending'])
+            self.assertNotIn('ETag', response)
+            self.assertEqual(self._queued_ids(), {self.target.id})
+
+            # The worker also picks up lists it was not asked about
+            MatchListJob.objects.all().delete()
+            call_command('materialize_matches', '--once', stdout=io.StringIO())
+            recomputed = MatchList.objects.get(user=self.target)
+            self.assertNotEqual(recomputed.weights_hash, stored.weights_hash)
+            self.assertNotEqual(recomputed.matches[0]['compatibility_score'], stored.matches[0]['compatibility_score'])
+
+            response = self.client.get('/api/v1/matches/', {'id': self.target.id})
+            self.assertFalse(response.data['recompute_pending'])
+            self.assertIn('ETag', response)
+
+    def test_failed_jobs_stay_queued(self):
+        self.candidate.date_of_birth = date(1960, 1, 1)
+        self.candidate.save()
+        self.unrelated.matchmaker = None
+        self.unrelated.save()
+
+        with mock.patch(
+            'api.management.commands.materialize_matches.materialize_match_list', side_effect=RuntimeError("boom")
+        ):
+            call_command('materialize_matches', '--once', stdout=io.StringIO(), stderr=io.StringIO())
+        # The failed job is kept for a retry, the one of the no longer assigned user is dropped with its list
+        self.assertEqual(self._queued_ids(), {self.target.id})
+        self.assertFalse(MatchList.objects.filter(user=self.unrelated).exists())
+
+        call_command('materialize_matches', '--once', stdout=io.StringIO())
+        self.assertEqual(self._queued_ids(), set())
+        self.assertEqual(MatchList.objects.get(user=self.target).total_matches_found, 0)
+
+
+class BulkMatchesTest(TestCase):
+    """The bulk endpoint scores all assigned users in a constant number of queries"""
+
+    def setUp(self):
+        self.matchmaker = MatchMaker.objects.create(username="matchmaker")
+        self.client = authenticated_client(self.matchmaker)
+        self.languages = [Language.objects.create(name=name) for name in ('hindi', 'english', 'tamil')]
+        for index in range(30):
+            create_profile(None, 'female', index, self.languages[index % 3:])
+
+    def test_bulk_matches_equal_single_user_matches(self):
+        for count in (2, 6):
+            for index in range(User.objects.filter(gender='male').count(), count):
+                create_profile(self.matchmaker, 'male', index, self.languages[:1 + index % 3])
+
+            # users, their languages, store check, candidate features, top profiles and languages
+            with self.assertNumQueries(6):
+                response = self.client.get('/api/v1/matches/bulk/')
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['total_users'], count)
+            for result in response.data['results']:
+                single = self.client.get('/api/v1/matches/', {'id': result['user_id'], 'fresh': 1}).data
+                self.assertEqual(result['total_matches_found'], single['total_matches_found'])
+                self.assertEqual(result['matches'], single['matches'])
+
+        response = self.client.get('/api/v1/matches/bulk/', {'ids': f"{result['user_id']}", 'k': 3})
+        self.assertEqual([r['user_id'] for r in response.data['results']], [result['user_id']])
+        self.assertEqual(len(response.data['results'][0]['matches']), 3)
+
+
+class MutualMatchesTest(TestCase):
+    """Mutual mode ranks by both one-sided scores of every pair"""
+
+    def setUp(self):
+        self.matchmaker = MatchMaker.objects.create(username="matchmaker")
+        self.client = authenticated_client(self.matchmaker)
+        self.target = create_profile(self.matchmaker, 'male', 0)
+        for index in range(1, 8):
+            candidate = create_profile(None, 'female', index)
+            candidate.income = 400000 * index
+            candidate.height = 1.50 + index / 50
+            candidate.save()
+
+    def test_mutual_scores_combine_both_directions(self):
+        engine = AdvancedMatchmakingEngine()
+        response = self.client.get('/api/v1/matches/', {'id': self.target.id, 'mode': 'mutual', 'combiner': 'min'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['matches']), 7)
+
+        scores = [match['compatibility_score'] for match in response.data['matches']]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        for match in response.data['matches']:
+            candidate = User.objects.get(id=match['id'])
+            forward = engine.calculate_comprehensive_score(self.target, candidate)['total_score']
+            reverse = engine.calculate_comprehensive_score(candidate, self.target)['total_score']
+            self.assertEqual(match['score_for_user'], round(forward, 1))
+            self.assertEqual(match['score_for_match'], round(reverse, 1))
+            self.assertEqual(match['compatibility_score'], round(min(forward, reverse), 1))
+
+        response = self.client.get('/api/v1/matches/', {'id': self.target.id, 'mode': 'mutual', 'combiner': 'max'})
+        self.assertEqual(response.status_code, 400)
+
+
+class MatchesPaginationTest(TestCase):
+    """Cursor pages walk the full ranking in order, read from the score cache"""
+
+    def setUp(self):
+        self.matchmaker = MatchMaker.objects.create(username="matchmaker")
+        self.client = authenticated_client(self.matchmaker)
+        self.languages = [Language.objects.create(name=name) for name in ('hindi', 'english', 'tamil')]
+        self.target = create_profile(self.matchmaker, 'male', 0, self.languages[:2])
+        for index in range(1, 32):
+            create_profile(None, 'female', index, self.languages[index % 3:])
+
+    def _get_matches(self, **params):
+        return self.client.get('/api/v1/matches/', {'id': self.target.id, **params})
+
+    def test_pages_follow_the_full_ranking(self):
+        top = self._get_matches(fresh=1).data
+
+        matches, cursor = [], None
+        while True:
+            params = {'limit': 10, **({'cursor': cursor} if cursor else {})}
+            # target, pool ETag state, target languages, uncached check, count, page, features,
+            # profiles, languages
+            with self.assertNumQueries(9):
+                page = self._get_matches(**params).data
+            self.assertNotIn('parameter_scores', page['matches'][0])
+            self.assertEqual(page['total_matches_found'], 31)
+            matches += page['matches']
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(len(matches), 31)
+        self.assertEqual(
+            [match['id'] for match in matches[:25]], [match['id'] for match in top['matches']]
+        )
+        scores = [match['compatibility_score'] for match in matches]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+        detailed = self._get_matches(limit=5, detail=1).data['matches']
+        self.assertEqual(detailed, top['matches'][:5])
+        # Recomputed from the now cached scores, the list is unchanged
+        self.assertEqual(self._get_matches(fresh=1).data['matches'], top['matches'])
+        self.assertEqual(self._get_matches(cursor='not-a-cursor').status_code, 400)
+
+
+class BatchScoresTest(TestCase):
+    """Vectorized totals must equal calculate_comprehensive_score pair by pair"""
+
+    def test_matches_per_pair_scoring(self):
+        engine = AdvancedMatchmakingEngine()
+        rng = np.random.default_rng(1)
+        targets = [
+            feature_target('male'),
+            feature_target('female', religion='no_preference', caste=None, country='usa', relocate=True),
+            feature_target('male', religion='atheist', income=None, height=None, want_kids=None, siblings=-1),
+            feature_target('female', religion='spiritual', education_level=0, languages=0, prestige=1.0),
+            feature_target('male', education_level=1, city=None, country=None, marital_status='divorced'),
+            feature_target('other', want_kids='maybe', education_level=6),
+            feature_target(None, religion=None, income=3000000.0),
+        ]
+        for target in targets:
+            rows = random_feature_rows(rng, 400, 'male' if target.gender == 'female' else 'female')
+            batch = engine.calculate_batch_scores(target, rows)
+            expected = [engine.calculate_comprehensive_score(target, CandidateFeatures(*row)) for row in rows]
+            with self.subTest(gender=target.gender, religion=target.religion):
+                self.assertEqual(batch.totals.tolist(), [score['total_score'] for score in expected])
+                self.assertEqual(
+                    batch.parameter_scores.T.tolist(),
+                    [[score['parameter_scores'][param]['score'] for param in PARAMETERS] for score in expected],
+                )
+
+
+class TopMatchesPruningTest(TestCase):
+    """Branch-and-bound selection must equal a full sort of the exact totals"""
+
+    def test_pruned_selection_equals_full_sort(self):
+        engine = AdvancedMatchmakingEngine()
+        rows = random_feature_rows(np.random.default_rng(5), 3 * PRUNING_CHUNK_SIZE, 'female')
+        # Copies under later ids tie exactly with their originals
+        rows += [(len(rows) + 1 + index,) + row[1:] for index, row in enumerate(rows[:500])]
+        target = feature_target('male')
+
+        totals = engine.calculate_batch_scores(target, rows).totals
+        ranked = [position for position in np.argsort(-totals, kind='stable') if totals[position] > 30]
+        expected = [(float(totals[position]), rows[position][0]) for position in ranked[:25]]
+
+        with mock.patch.object(TopKSelector, 'count', autospec=True, side_effect=TopKSelector.count) as count:
+            top = engine.find_top_matches(target, rows, workers=1)
+
+        self.assertEqual([(score, result.candidate.id) for score, result in top.results()], expected)
+        self.assertEqual(top.total, len(ranked))
+        self.assertLess(len({score for score, _ in expected}), len(expected))
+        # Candidates above the threshold were settled without exact totals
+        self.assertTrue(any(call.args[1] > 0 for call in count.call_args_list))
+
+
+class ParallelScorerTest(TestCase):
+    """Sharded scoring must equal serial scoring, ties included"""
+
+    def test_matches_serial_scoring(self):
+        engine = AdvancedMatchmakingEngine()
+        rows = random_feature_rows(np.random.default_rng(11), 3001, 'male')
+        rows += [(len(rows) + 1 + index,) + row[1:] for index, row in enumerate(rows[:300])]
+        target = feature_target('female')
+        scorer = ParallelScorer(engine, 2, min_pool=0)
+
+        serial = engine.find_top_matches(target, rows, workers=1)
+        parallel = scorer.select(target, rows, TopKSelector())
+        self.assertEqual(
+            [(score, result.candidate.id) for score, result in parallel.results()],
+            [(score, result.candidate.id) for score, result in serial.results()],
+        )
+        self.assertEqual(parallel.total, serial.total)
+
+        batch = engine.calculate_batch_scores(target, rows)
+        chunks = list(scorer.score_chunks(target, rows))
+        self.assertEqual(len(chunks), 2)
+        np.testing.assert_array_equal(np.concatenate([ids for ids, _ in chunks]), batch.ids)
+        np.testing.assert_array_equal(np.concatenate([totals for _, totals in chunks]), batch.totals)
+
+
+class MatchExportTest(TestCase):
+    """The export streams one NDJSON record per candidate in the pool"""
+
+    def setUp(self):
+        self.matchmaker = MatchMaker.objects.create(username="matchmaker")
+        self.client = authenticated_client(self.matchmaker)
+        self.target = create_profile(self.matchmaker, 'male', 0)
+        self.candidates = [create_profile(None, 'female', index) for index in range(1, 6)]
+        # Outside the age window, with no date of birth and of the same gender
+        self.candidates.append(create_profile(None, 'female', 6))
+        self.candidates[-1].date_of_birth = date(1950, 1, 1)
+        self.candidates[-1].save()
+        undated = create_profile(None, 'female', 7)
+        undated.date_of_birth = None
+        undated.save()
+        create_profile(None, 'male', 8)
+
+    def test_export_streams_every_candidate(self):
+        response = self.client.get('/api/v1/matches/export/', {'id': self.target.id})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([record['candidate_id'] for record in records], [candidate.id for candidate in self.candidates])
+        self.assertEqual(len(records), User.objects.filter(gender='female', date_of_birth__isnull=False).count())
+
+        engine = AdvancedMatchmakingEngine()
+        for record, candidate in zip(records, self.candidates):
+            self.assertEqual(
+                record['compatibility_score'], engine.calculate_comprehensive_score(self.target, candidate)['total_score']
+            )
+
+
+class UsersQueryCountTest(TestCase):
+    """The users endpoint must not issue queries per assigned user"""
+
+    def setUp(self):
+        self.matchmaker = MatchMaker.objects.create(username="matchmaker")
+        self.client = authenticated_client(self.matchmaker)
+        self.languages = [Language.objects.create(name=name) for name in ('hindi', 'english', 'tamil')]
+
+    def test_query_count_is_constant(self):
+        for count in (2, 30):
+            for index in range(User.objects.count(), count):
+                create_profile(self.matchmaker, ('male', 'female')[index % 2], index, self.languages[index % 3:])
+
+            # ETag state, users with their matchmaker, languages
+            with self.assertNumQueries(3):
+                response = self.client.get('/api/v1/users/')
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['total_users'], count)
+            self.assertEqual(len(response.data['data']), count)
+            self.assertEqual(response.data['data'][0]['matchmaker_info']['id'], self.matchmaker.id)
+
+
+class UsersPaginationTest(TestCase):
+    """Users pages, sparse fields and conditional requests"""
+
+    def setUp(self):
+        self.matchmaker = MatchMaker.objects.create(username="matchmaker")
+        self.client = authenticated_client(self.matchmaker)
+        self.languages = [Language.objects.create(name=name) for name in ('hindi', 'english', 'tamil')]
+        for index in range(7):
+            create_profile(self.matchmaker, ('male', 'female')[index % 2], index, self.languages[index % 3:])
+
+    def test_pages_follow_the_full_list(self):
+        full = self.client.get('/api/v1/users/').data['data']
+
+        pages, cursor = [], None
+        while True:
+            params = {'limit': 3, 'fields': 'id,created_at'}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/api/v1/users/', params)
+            self.assertEqual(response.data['total_users'], 7)
+            pages.extend(response.data['data'])
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(pages, [{'id': user['id'], 'created_at': user['created_at']} for user in full])
+        self.assertEqual(self.client.get('/api/v1/users/', {'fields': 'id,nope'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/users/', {'cursor': 'nope'}).status_code, 400)
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get('/api/v1/users/')
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        # ETag state
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/users/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        User.objects.get(first_name="male0").languages_known.set(self.languages[:1])
+        response = self.client.get('/api/v1/users/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class FastUserSerializerTest(TestCase):
+    """FastUserSerializer must render exactly what UserSerializer renders"""
+
+    def test_matches_user_serializer(self):
+        from .serializers import FastUserSerializer, UserSerializer
+
+        matchmaker = MatchMaker.objects.create(username="matchmaker")
+        languages = [Language.objects.create(name=name) for name in ('hindi', 'english', 'tamil')]
+        for index in range(4):
+            create_profile(matchmaker, ('male', 'female')[index % 2], index, languages[index % 3:])
+        User.objects.create(email="bare@example.com")
+        User.objects.filter(first_name="male2").update(income='1234.5', height=1.755)
+
+        users = User.objects.order_by('id')
+        expected = json.loads(json.dumps(UserSerializer(users, many=True).data))
+        self.assertEqual(FastUserSerializer(users, many=True).data, expected)
+        self.assertEqual(FastUserSerializer(users.filter(id=users[1].id)).data, expected[1])
+
+
+class PrincipalCacheTest(TestCase):
+    """Authenticated matchmakers are cached until they change"""
+
+    def setUp(self):
+        self.matchmaker = MatchMaker.objects.create(username="matchmaker")
+        self.token = generate_jwt_tokens(self.matchmaker)
+
+    def test_cached_until_changed(self):
+        with self.assertNumQueries(1):
+            get_user_from_token(self.token)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_from_token(self.token).username, "matchmaker")
+
+        self.matchmaker.username = "renamed"
+        self.matchmaker.save()
+        self.assertEqual(get_user_from_token(self.token).username, "renamed")
+
+        self.matchmaker.is_active = False
+        self.matchmaker.save()
+        self.assertIsNone(get_user_from_token(self.token))
+
+        with override_settings(JWT_STATELESS_AUTH=True), self.assertNumQueries(0):
+            self.assertEqual(get_user_from_token(self.token).id, self.matchmaker.id)
+
+
+class KnowledgeBaseIndexTest(TestCase):
+    """The KB index only re-embeds changed documents and ranks like a full scan"""
+
+    def test_incremental_build_and_search(self):
+        from .llm.embeddings import LocalEmbedder
+        from .llm.main import KnowledgeBaseIndex, cosine_similarity, document_text, kb
+
+        embedder = LocalEmbedder(dim=16)
+        documents = [dict(doc) for doc in kb['documents']]
+        with tempfile.TemporaryDirectory() as directory:
+            index = KnowledgeBaseIndex(documents, path=os.path.join(directory, 'kb-index.npy'))
+            self.assertEqual(index.build(embed_many=embedder.embed_batch), len(documents))
+            self.assertEqual(index.build(embed_many=embedder.embed_batch), 0)
+            documents[3]['name'] = 'Changed'
+            self.assertEqual(index.build(embed_many=embedder.embed_batch), 1)
+
+            queries = [embedder.embed("query"), embedder.embed("income and caste")]
+            for query, found in zip(queries, index.search_many(queries, top_k=5)):
+                expected = sorted(
+                    range(len(documents)), key=lambda i: -cosine_similarity(query, embedder.embed(document_text(documents[i])))
+                )
+                self.assertEqual(found, expected[:5])
+                self.assertEqual(index.search(query, top_k=5), found)
+
+
+class HuggingFaceEmbedderTest(TestCase):
+    """Token-level outputs are mean-pooled per text over that text's own tokens"""
+
+    def test_pools_ragged_token_outputs(self):
+        from .llm.embeddings import HuggingFaceEmbedder
+
+        class TokenClient:
+            def feature_extraction(self, texts):
+                return [[[float(len(text)), float(token)] for token in range(len(text.split()))] for text in texts]
+
+        vectors = HuggingFaceEmbedder(TokenClient(), "token-model").embed_batch(["one", "one two three"])
+        np.testing.assert_array_equal(vectors, np.array([[3.0, 0.0], [13.0, 1.0]], dtype=np.float32))
+
+        class SentenceClient:
+            def feature_extraction(self, texts):
+                return np.ones((len(texts), 4))
+
+        self.assertEqual(HuggingFaceEmbedder(SentenceClient(), "sentence-model").embed("a text").shape, (4,))
+
+
+class EmbeddingCacheTest(TestCase):
+    """Embeddings are served from memory, then the table, before the embedder"""
+
+    def test_tiers_and_eviction(self):
+        from .llm.embeddings import EmbeddingCache, LocalEmbedder
+
+        cache = EmbeddingCache(LocalEmbedder(dim=8), memory_size=2, max_entries=3)
+        vector = cache.get("software engineer in mumbai")
+        np.testing.assert_array_equal(vector, LocalEmbedder(dim=8).embed("software engineer in mumbai"))
+
+        with self.assertNumQueries(0):
+            np.testing.assert_array_equal(cache.get("software engineer in mumbai"), vector)
+        cache.clear_memory()
+        np.testing.assert_array_equal(cache.get("software engineer in mumbai"), vector)
+        self.assertEqual((cache.memory_hits, cache.disk_hits, cache.misses), (1, 1, 1))
+
+        for text in ("one", "two", "three"):
+            cache.get(text)
+        self.assertEqual(CachedEmbedding.objects.count(), 3)
+        self.assertFalse(CachedEmbedding.objects.filter(text_hash=cache.text_hash("software engineer in mumbai")).exists())
+
+    def test_batches_embed_each_text_once(self):
+        from .llm.embeddings import EmbeddingCache, LocalEmbedder
+
+        class CountingEmbedder(LocalEmbedder):
+            batches = []
+
+            def embed_batch(self, texts):
+                self.batches.append(len(texts))
+                return super().embed_batch(texts)
+
+        embedder = CountingEmbedder(dim=8)
+        cache = EmbeddingCache(embedder, memory_size=10, max_entries=10, batch_size=2)
+        cache.get("one")
+        texts = ["one", "two", "three", "two", "four", "five"]
+        vectors = cache.get_many(texts)
+
+        self.assertEqual(embedder.batches, [1, 2, 2])
+        for text, vector in zip(texts, vectors):
+            np.testing.assert_allclose(vector, LocalEmbedder(dim=8).embed(text), rtol=1e-6)
+        self.assertEqual((cache.memory_hits, cache.misses), (1, 6))
+
+
+class AsyncVerdictsTest(TestCase):
+    """LLM calls for many pairs run concurrently, bounded, with retries"""
+
+    class Client:
+        def __init__(self, delay, failures=0):
+            self.delay = delay
+            self.failures = failures
+            self.in_flight = self.max_in_flight = self.calls = 0
+
+        async def text_generation(self, prompt, **kwargs):
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                await asyncio.sleep(self.delay)
+                if self.calls <= self.failures:
+                    raise ConnectionError("unavailable")
+                return f'Verdict: {{"compatibility_score": {len(prompt)}, "reason": "ok"}}'
+            finally:
+                self.in_flight -= 1
+
+    def _run(self, client, prompts, **options):
+        from .llm.main import generate_verdicts_async
+
+        return asyncio.run(generate_verdicts_async(prompts, client=client, backoff=0, **options))
+
+    def test_concurrent_bounded_and_retried(self):
+        prompts = ['x' * length for length in range(1, 26)] + [None]
+        client = self.Client(delay=0.2, failures=2)
+
+        started = time.perf_counter()
+        verdicts = self._run(client, prompts, concurrency=10, retries=1)
+        # Three waves of at most 10 calls, plus one retry wave for the two failures
+        self.assertLess(time.perf_counter() - started, 1.5)
+        self.assertEqual(client.max_in_flight, 10)
+        self.assertEqual([verdict['compatibility_score'] for verdict in verdicts[:-1]], list(range(1, 26)))
+        self.assertIsNone(verdicts[-1])
+
+        verdicts = self._run(self.Client(delay=1), ['x'], timeout=0.05, retries=1)
+        self.assertIsNone(verdicts[0]['compatibility_score'])
+
+
+class VerdictCacheTest(TestCase):
+    """Parsed LLM verdicts are reused until a profile, the prompt or the KB changes"""
+
+    def test_verdicts_keyed_by_profiles_and_versions(self):
+        from .llm.main import compatibility_requests, verdict_cache, verdict_key
+        from .llm.verdicts import VerdictCache
+
+        matchmaker = MatchMaker.objects.create(username="matchmaker")
+        target = create_profile(matchmaker, 'male', 0)
+        candidates = [create_profile(None, 'female', index) for index in (1, 2)]
+        candidates[1].religion = 'sikhism'
+        candidates[1].save()
+        keys = [verdict_key(target, candidate) for candidate in candidates]
+        self.assertNotEqual(keys[0], keys[1])
+
+        cache = VerdictCache(verdict_cache.model, verdict_cache.prompt_version, verdict_cache.kb_version)
+        self.assertEqual(cache.store(keys[0], {'compatibility_score': 4, 'reason': "Shared values"}),
+                         {'compatibility_score': 4.0, 'reason': "Shared values"})
+        cache.store(keys[1], {'compatibility_score': None, 'reason': "Failed to parse model output"})
+        self.assertEqual(set(cache.lookup(keys)), {keys[0]})
+
+        # Cached pairs need no prompt, so no retrieval or LLM call
+        (key, cached, prompt), = compatibility_requests([(target.id, candidates[0].id)])
+        self.assertEqual((key, prompt), (keys[0], None))
+        self.assertEqual(cached['compatibility_score'], 4.0)
+        self.assertEqual(compatibility_requests([(target.id, 0)]), [(None, None, None)])
+
+        candidates[0].city = "Pune"
+        candidates[0].save()
+        self.assertEqual(cache.lookup([verdict_key(target, candidates[0])]), {})
+        self.assertEqual(VerdictCache(cache.model, 'other', cache.kb_version).lookup(keys), {})
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['stored'], stats['uncacheable']), (1, 2, 1, 1))
+        self.assertEqual(stats['entries'], 1)
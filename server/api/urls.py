@@ -6,5 +6,7 @@ urlpatterns = [
     path('login/', views.LoginView.as_view(), name='Login'),
     path('users/', views.UsersView.as_view(), name='get user(s) assigned to the matchmaker'),
     path('matches/', views.MatchesView.as_view(), name = "get matches for a user assigned to the matchmaker"),
+    path('matches/export/', views.MatchExportView.as_view(), name="stream every candidate score for a user as NDJSON"),
+    path('matches/bulk/', views.BulkMatchesView.as_view(), name="get matches for several users assigned to the matchmaker"),
     path('email/', views.EmailView, name="trigger email")
 ] 
\ No newline at end of file
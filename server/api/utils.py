@@ -1,17 +1,25 @@
 import jwt
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 from django.conf import settings
 from .models import *
 
 
+# MatchMaker fields loaded for an authenticated request; others are deferred
+PRINCIPAL_FIELDS = ['id', 'username', 'is_active']
+
+
 def generate_jwt_tokens(user):
     access_payload = {
         'user_id': user.id,
+        'username': user.username,
         'exp': datetime.now() + settings.JWT_ACCESS_TOKEN_LIFETIME,
     }
-    
+
     access_token = jwt.encode(access_payload, settings.SECRET_KEY, algorithm='HS256')
-    
+
     return access_token
 
 
@@ -24,15 +32,72 @@ def decode_jwt_token(token):
         return None
 
 
+class PrincipalCache:
+    """
+    In-process LRU of the PRINCIPAL_FIELDS of authenticated matchmakers, by
+    id. Entries live for at most ``ttl`` seconds and never past the expiry
+    of the token that loaded them; the MatchMaker signals in models.py drop
+    an entry as soon as the matchmaker is saved or deleted. Other processes
+    only see such changes once their entry expires.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, exp):
+        """A MatchMaker with only PRINCIPAL_FIELDS loaded, or None if it does not exist"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return MatchMaker.from_db(None, PRINCIPAL_FIELDS, entry[1])
+            self.misses += 1
+
+        values = MatchMaker.objects.filter(id=user_id).values_list(*PRINCIPAL_FIELDS).first()
+        if values is None:
+            return None
+
+        expires = now + max(0, min(self.ttl, exp - time.time()))
+        with self._lock:
+            self._entries[user_id] = (expires, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return MatchMaker.from_db(None, PRINCIPAL_FIELDS, values)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(settings.JWT_PRINCIPAL_CACHE_SIZE, settings.JWT_PRINCIPAL_CACHE_TTL)
+
+
 def get_user_from_token(token):
+    """
+    Active MatchMaker of a valid token. The token's claims alone are used
+    when JWT_STATELESS_AUTH is on, the principal cache otherwise.
+    """
     payload = decode_jwt_token(token)
-    print("payload:", payload)
-    if payload:
-        try:
-            user = MatchMaker.objects.get(id=payload['user_id'])
-            return user
-        except MatchMaker.DoesNotExist:
-            return None
-    return None
+    if not payload:
+        return None
 
+    if settings.JWT_STATELESS_AUTH and 'username' in payload:
+        # Deactivations only take effect once the token expires
+        return MatchMaker.from_db(None, PRINCIPAL_FIELDS, (payload['user_id'], payload['username'], True))
 
+    user = principal_cache.get(payload['user_id'], payload['exp'])
+    if user is None or not user.is_active:
+        return None
+    return user
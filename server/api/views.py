@@ -8,22 +8,31 @@ from .authentication import *
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Q, F
+from django.db.models import Q, F, Count, Exists, Max, OuterRef, prefetch_related_objects
 from math import radians, cos, sin, asin, sqrt
 from datetime import datetime, timedelta
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers, quote_etag
+from django.utils.http import http_date
 import operator
 from functools import reduce
 from datetime import date
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 import traceback
+import base64
+import hashlib
 import json as pyjson
 
 
 from api.llm.main import generate_matchmaker_email
+from .constants import EDUCATION_HIERARCHY, PRESTIGE_COMPANIES, SENIOR_DESIGNATIONS
+from .matching import (
+    COMBINERS, BatchScorer, MatchScoreCache, MatrixScorer, ParallelScorer, TopKSelector, as_features,
+    candidate_pool, load_features, match_export_lines, start_of_day, weights_fingerprint,
+)
 
 class AdvancedMatchmakingEngine:
     """
@@ -31,6 +40,9 @@ class AdvancedMatchmakingEngine:
     behavioral and preference data for Indian professionals
     """
     
+    # Part of the MatchScore cache key: bump when scoring rules change
+    VERSION = 'Research-Based v2.0'
+    
     # Gender-specific parameter weights (as percentages)
     MALE_WEIGHTS = {
         'age': 15,
@@ -62,58 +74,19 @@ class AdvancedMatchmakingEngine:
         'open_to_pets': 3
     }
     
-    # Education hierarchy for better matching
-    EDUCATION_HIERARCHY = {
-        # Doctorate/Medical (Level 6)
-        'phd': 6, 'md': 6, 'dm': 6, 'mch': 6, 'ms_medical': 6,
-        
-        # Masters/Professional (Level 5)
-        'mtech': 5, 'me': 5, 'ms': 5, 'mba': 5, 'mba_finance': 5, 
-        'mba_marketing': 5, 'mba_hr': 5, 'mba_operations': 5, 'mba_it': 5,
-        'pgdm': 5, 'msc': 5, 'mcom': 5, 'ma': 5, 'mca': 5, 'llm': 5,
-        'med': 5, 'mpharm': 5, 'mds': 5, 'march': 5, 'mdes': 5,
-        
-        # Professional Bachelor's (Level 4)
-        'mbbs': 4, 'btech': 4, 'be': 4, 'btech_cse': 4, 'btech_ece': 4,
-        'btech_eee': 4, 'btech_mech': 4, 'btech_civil': 4, 'btech_chemical': 4,
-        'btech_it': 4, 'llb': 4, 'bpharm': 4, 'bds': 4, 'barch': 4, 'bvsc': 4,
-        'bca': 4,
-        
-        # Regular Bachelor's (Level 3)
-        'bsc': 3, 'bcom': 3, 'ba': 3, 'bba': 3, 'bcom_honours': 3,
-        'bsc_physics': 3, 'bsc_chemistry': 3, 'bsc_cs': 3, 'bsc_it': 3,
-        'ba_english': 3, 'ba_economics': 3, 'bed': 3, 'bfa': 3,
-        
-        # Diplomas (Level 2)
-        'diploma': 2, 'polytechnic': 2, 'iti': 2,
-        
-        # School (Level 1)
-        '12th': 1,
-        
-        # Generic
-        'graduation': 3, 'postgraduation': 5, 'other': 3
-    }
-    
-    # High-prestige companies for company scoring
-    PRESTIGE_COMPANIES = [
-        'google', 'microsoft', 'apple', 'amazon', 'meta', 'netflix', 'tesla',
-        'goldman sachs', 'jp morgan', 'morgan stanley', 'blackrock',
-        'mckinsey', 'bain', 'bcg', 'deloitte', 'pwc', 'kpmg', 'ey',
-        'tcs', 'infosys', 'wipro', 'hcl', 'tech mahindra', 'cognizant',
-        'reliance', 'tata', 'adani', 'bajaj', 'mahindra', 'birla'
-    ]
-    
-    # Senior designations
-    SENIOR_DESIGNATIONS = [
-        'director', 'vp', 'vice president', 'ceo', 'cto', 'cfo', 'founder',
-        'co-founder', 'head', 'lead', 'principal', 'senior manager', 'manager'
-    ]
+    # Lookup tables shared with UserFeatures.derive, see constants.py
+    EDUCATION_HIERARCHY = EDUCATION_HIERARCHY
+    PRESTIGE_COMPANIES = PRESTIGE_COMPANIES
+    SENIOR_DESIGNATIONS = SENIOR_DESIGNATIONS
     def calculate_comprehensive_score(self, target_user, candidate):
         """
-        Comprehensive scoring based on research data with gender-specific weights
+        Comprehensive scoring based on research data with gender-specific weights.
+        Accepts User instances or precomputed CandidateFeatures records.
         """
-        target_age = self._calculate_age(target_user.date_of_birth)
-        candidate_age = self._calculate_age(candidate.date_of_birth)
+        target_user = as_features(target_user)
+        candidate = as_features(candidate)
+        target_age = target_user.age()
+        candidate_age = candidate.age()
         
         # Choose weights based on target user's gender (they're the one being matched)
         weights = self.MALE_WEIGHTS if target_user.gender == 'male' else self.FEMALE_WEIGHTS
@@ -203,6 +176,53 @@ class AdvancedMatchmakingEngine:
             'risk_factors': risk_factors[:5]  # Top concerns
         }
 
+    def calculate_batch_scores(self, target_user, candidates):
+        """
+        Vectorized counterpart of calculate_comprehensive_score: scores all
+        candidates (precomputed feature rows) in one NumPy pass, without
+        building reasons
+        """
+        return BatchScorer(self).score(target_user, candidates)
+
+    def find_top_matches(self, target_user, candidates, k=25, threshold=30, workers=None):
+        """
+        Branch-and-bound top-K over candidate feature rows: most candidates
+        are rejected after the heaviest parameters without full scoring.
+        Large pools are sharded over ``workers`` processes (default
+        settings.MATCHING_WORKERS). Returns the TopKSelector holding
+        (score, MatchResult) results.
+        """
+        return ParallelScorer(self, workers).select(target_user, candidates, TopKSelector(k=k, threshold=threshold))
+
+    def calculate_mutual_scores(self, target_user, candidates, combiner='geometric'):
+        """
+        Two-sided counterpart of calculate_batch_scores: scores each pair
+        from the target's and from the candidate's side in one pass and
+        combines them with COMBINERS[combiner] (min, geometric, harmonic)
+        """
+        return BatchScorer(self).score_mutual(target_user, candidates, combiner)
+
+    def find_mutual_top_matches(self, target_user, candidates, k=25, threshold=30, combiner='geometric'):
+        """Top-K over candidate feature rows ranked by mutual score"""
+        return BatchScorer(self).select_mutual(
+            target_user, candidates, TopKSelector(k=k, threshold=threshold), combiner
+        )
+
+    def find_top_matches_bulk(self, target_users, k=25, threshold=30):
+        """
+        Top-K for many targets in one pass: each candidate pool is loaded
+        once and scored as a targets x candidates matrix. Returns
+        TopKSelectors of (score, MatchResult) keyed by target id.
+        """
+        return MatrixScorer(self).select(target_users, k=k, threshold=threshold)
+
+    def find_cached_top_matches(self, target_user, potential_matches, k=25, threshold=30):
+        """
+        Top-K over a candidate queryset using the persistent MatchScore
+        cache: only pairs without a valid cached total are scored
+        """
+        return MatchScoreCache(self).select(target_user, potential_matches, TopKSelector(k=k, threshold=threshold))
+
     def _calculate_age(self, birth_date):
         """Calculate current age"""
         today = date.today()
@@ -248,8 +268,8 @@ class AdvancedMatchmakingEngine:
         if not target_user.income or not candidate.income:
             return {'score': 0.5, 'reason': 'Incomplete income information'}
         
-        target_income = float(target_user.income)
-        candidate_income = float(candidate.income)
+        target_income = target_user.income
+        candidate_income = candidate.income
         
         if target_user.gender == 'male':
             # Men less sensitive to partner's income, but stability matters
@@ -313,13 +333,14 @@ class AdvancedMatchmakingEngine:
 
     def _score_location_compatibility(self, target_user, candidate):
         """Location and relocation scoring"""
+        # City and country are stored lowercased
         same_city = (target_user.city and candidate.city and 
-                    target_user.city.lower() == candidate.city.lower())
+                    target_user.city == candidate.city)
         same_country = (target_user.country and candidate.country and 
-                    target_user.country.lower() == candidate.country.lower())
+                    target_user.country == candidate.country)
         
-        target_relocate = target_user.open_to_relocate == 'yes'
-        candidate_relocate = candidate.open_to_relocate == 'yes'
+        target_relocate = target_user.relocate
+        candidate_relocate = candidate.relocate
         
         if same_city and same_country:
             score = 1.0
@@ -361,11 +382,12 @@ class AdvancedMatchmakingEngine:
 
     def _score_education_compatibility(self, target_user, candidate):
         """Education scoring with hierarchy"""
-        if not target_user.degree or not candidate.degree:
+        # Levels come from EDUCATION_HIERARCHY, 0 when no degree is set
+        if not target_user.education_level or not candidate.education_level:
             return {'score': 0.4, 'reason': 'Incomplete education data'}
         
-        target_level = self.EDUCATION_HIERARCHY.get(target_user.degree, 3)
-        candidate_level = self.EDUCATION_HIERARCHY.get(candidate.degree, 3)
+        target_level = target_user.education_level
+        candidate_level = candidate.education_level
         
         level_diff = abs(target_level - candidate_level)
         
@@ -399,8 +421,8 @@ class AdvancedMatchmakingEngine:
 
     def _score_career_compatibility(self, target_user, candidate):
         """Company and designation scoring"""
-        target_prestige = self._calculate_career_prestige(target_user)
-        candidate_prestige = self._calculate_career_prestige(candidate)
+        target_prestige = target_user.prestige
+        candidate_prestige = candidate.prestige
         
         if target_user.gender == 'female':
             # Women value men's career more heavily
@@ -424,24 +446,6 @@ class AdvancedMatchmakingEngine:
         
         return {'score': score, 'reason': reason}
 
-    def _calculate_career_prestige(self, user):
-        """Calculate career prestige score"""
-        prestige = 0.5  # Base score
-        
-        # Company prestige
-        if user.current_company:
-            company_lower = user.current_company.lower()
-            if any(prestige_co in company_lower for prestige_co in self.PRESTIGE_COMPANIES):
-                prestige += 0.3
-        
-        # Designation seniority
-        if user.designation:
-            designation_lower = user.designation.lower()
-            if any(senior_des in designation_lower for senior_des in self.SENIOR_DESIGNATIONS):
-                prestige += 0.2
-        
-        return min(prestige, 1.0)
-
     def _score_marital_status(self, target_user, candidate):
         """Marital status compatibility"""
         target_status = target_user.marital_status or 'single'
@@ -458,7 +462,7 @@ class AdvancedMatchmakingEngine:
 
     def _score_family_compatibility(self, target_user, candidate):
         """Siblings/family size scoring"""
-        if target_user.siblings is None or candidate.siblings is None:
+        if target_user.siblings < 0 or candidate.siblings < 0:  # -1 when unknown
             return {'score': 0.5, 'reason': 'Family size data incomplete'}
         
         sibling_diff = abs(target_user.siblings - candidate.siblings)
@@ -480,20 +484,22 @@ class AdvancedMatchmakingEngine:
 
     def _score_language_compatibility(self, target_user, candidate):
         """Language compatibility scoring"""
-        target_languages = set(lang.name for lang in target_user.languages_known.all())
-        candidate_languages = set(lang.name for lang in candidate.languages_known.all())
+        # Languages as bitmasks over LANGUAGE_CHOICES; overlap is a popcount
+        target_languages = target_user.languages
+        candidate_languages = candidate.languages
         
         if not target_languages or not candidate_languages:
             return {'score': 0.4, 'reason': 'Language data incomplete'}
         
-        common_languages = target_languages.intersection(candidate_languages)
+        common_languages = target_languages & candidate_languages
+        common_count = common_languages.bit_count()
         
-        if len(common_languages) >= 2:
+        if common_count >= 2:
             score = 1.0
-            reason = f"Share {len(common_languages)} languages"
-        elif len(common_languages) >= 1:
+            reason = f"Share {common_count} languages"
+        elif common_count >= 1:
             # Check if it's a major language
-            major_common = common_languages.intersection({'english', 'hindi'})
+            major_common = common_languages & MAJOR_LANGUAGE_MASK
             if major_common:
                 score = 0.8
                 reason = "Share major common language"
@@ -582,9 +588,20 @@ class LoginView(generics.CreateAPIView):
 class UsersView(APIView):
     """
     DRF APIView to get users assigned to the authenticated matchmaker
+    GET /api/v1/users/ or /api/v1/users/?id=123
+    
+    The list is ordered by creation. ?limit=N (at most 100) returns one page
+    of it; pass the returned next_cursor as ?cursor= for the following page.
+    ?fields=id,first_name,... keeps only those fields of each user.
+    Lists carry an ETag and Last-Modified, and conditional requests for an
+    unchanged list get a 304 without loading any user.
     """
     permission_classes = [IsMatchMaker]
     authentication_classes = [JWTAuthentication]
+    # UserSerializer or FastUserSerializer; both render the same JSON
+    serializer_class = FastUserSerializer
+    
+    MAX_LIMIT = 100
     
     def get(self, request):
         try:
@@ -596,8 +613,28 @@ class UsersView(APIView):
             
             if user_id:
                 return self._get_single_user(matchmaker, user_id)
-            else:
-                return self._get_all_users(matchmaker)
+            
+            fields = request.query_params.get('fields')
+            fields = fields.split(',') if fields else None
+            if fields and not set(fields) <= set(UserSerializer.Meta.fields):
+                return Response({
+                    'error': f"fields must be a comma-separated subset of: {', '.join(UserSerializer.Meta.fields)}",
+                    'status': 'error'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            limit = request.query_params.get('limit')
+            cursor = request.query_params.get('cursor')
+            paginated = limit is not None or cursor is not None
+            try:
+                limit = max(1, min(int(limit or 25), self.MAX_LIMIT))
+                cursor = decode_cursor(cursor, datetime.fromisoformat, int) if cursor else None
+            except ValueError:
+                return Response({
+                    'error': 'limit must be an integer and cursor a next_cursor value',
+                    'status': 'error'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            return self._get_all_users(request, matchmaker, fields, limit if paginated else None, cursor)
         
         except Exception as e:
             return Response({
@@ -608,8 +645,13 @@ class UsersView(APIView):
     def _get_single_user(self, matchmaker, user_id):
         """Get a specific user assigned to the matchmaker"""
         try:
-            user = User.objects.get(id=user_id, matchmaker=matchmaker)
-            serializer = UserSerializer(user)
+            users = User.objects.select_related('matchmaker').prefetch_related('languages_known').filter(
+                id=user_id, matchmaker=matchmaker
+            )
+            if self.serializer_class is FastUserSerializer:
+                serializer = FastUserSerializer(users)
+            else:
+                serializer = UserSerializer(users.get())
             
             return Response({
                 'status': 'success',
@@ -622,29 +664,264 @@ class UsersView(APIView):
                 'status': 'error'
             }, status=status.HTTP_404_NOT_FOUND)
     
-    def _get_all_users(self, matchmaker):
-        """Get all users assigned to the matchmaker"""
-        users = matchmaker.assigned_users.all().order_by('created_at')
-        serializer = UserSerializer(users, many=True)
+    def _get_all_users(self, request, matchmaker, fields=None, limit=None, cursor=None):
+        """Get all users assigned to the matchmaker, or a page of them"""
+        users = matchmaker.assigned_users.all()
+        state = users.aggregate(last_modified=Max('updated_at'), total=Count('id'))
+        etag, last_modified = self._validators(request, matchmaker, state)
+        unchanged = not_modified(request, etag, last_modified)
+        if unchanged is not None:
+            return unchanged
+        
+        # One query for the users and one for their languages, in the
+        # (created_at, id) order of user_matchmaker_created_idx
+        users = users.select_related('matchmaker').prefetch_related('languages_known').order_by('created_at', 'id')
+        if cursor:
+            created_at, user_id = cursor
+            users = users.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=user_id))
+        
+        next_cursor = None
+        if limit is None:
+            data = self.serializer_class(users, many=True).data
+        else:
+            data = self.serializer_class(users[:limit + 1], many=True).data
+            if len(data) > limit:
+                data = data[:limit]
+                next_cursor = encode_cursor(data[-1]['created_at'], data[-1]['id'])
         
-        return Response({
+        if fields:
+            data = [{field: user[field] for field in fields if field in user} for user in data]
+        
+        response = {
             'status': 'success',
             'matchmaker': {
                 'id': matchmaker.id,
                 'username': matchmaker.username
             },
-            'total_users': users.count(),
-            'data': serializer.data
-        })
+            'total_users': state['total'],
+            'data': data
+        }
+        if limit is not None:
+            response['next_cursor'] = next_cursor
+        
+        return add_validators(Response(response), etag, last_modified)
+    
+    def _validators(self, request, matchmaker, state):
+        """
+        ETag and Last-Modified timestamp of the assigned users list. The user
+        count catches removals, which leave max(updated_at) unchanged; ages,
+        and with them the list, also change at midnight.
+        """
+        today = start_of_day()
+        last_modified = max(state['last_modified'], today) if state['last_modified'] else None
+        fingerprint = pyjson.dumps([
+            matchmaker.id, matchmaker.username, state['total'],
+            last_modified.isoformat() if last_modified else None, today.date().isoformat(),
+            sorted(request.query_params.lists()),
+        ])
+        etag = quote_etag(hashlib.sha256(fingerprint.encode()).hexdigest()[:32])
+        return etag, int(last_modified.timestamp()) if last_modified else None
+
+
+def build_match_list(engine, target_user):
+    """
+    Score a target's candidate pool and format its top 25 matches, in the
+    shape stored by MatchList and served by MatchesView
+    """
+    prefetch_related_objects([target_user], 'languages_known')
+    
+    # Get potential matches, prefiltered in SQL on gender and age window
+    potential_matches = candidate_pool(target_user)
+    
+    # Rank on cached pair totals, scoring only new or edited profiles
+    top_matches = engine.find_cached_top_matches(target_user, potential_matches, k=25, threshold=30)
+    
+    # Load full profiles and build reasons only for the matches we return
+    top_results = top_matches.results()
+    top_users = User.objects.prefetch_related('languages_known').in_bulk(
+        [result.candidate.id for _, result in top_results]
+    )
+    
+    return {
+        'total_matches_found': top_matches.total,
+        'algorithm_version': engine.VERSION,
+        'matches': format_matches(engine, target_user, top_results, top_users),
+    }
+
+
+def build_mutual_match_list(engine, target_user, combiner, detail=True):
+    """build_match_list ranked by mutual score, with both one-sided scores per match"""
+    prefetch_related_objects([target_user], 'languages_known')
+    
+    candidates = load_features(candidate_pool(target_user))
+    top_matches = engine.find_mutual_top_matches(target_user, candidates, k=25, threshold=30, combiner=combiner)
+    
+    top_results = top_matches.results()
+    top_users = User.objects.prefetch_related('languages_known').in_bulk(
+        [result.candidate.id for _, result in top_results]
+    )
+    matches_data = format_matches(engine, target_user, top_results, top_users, detail)
+    for match, (_, result) in zip(matches_data, top_results):
+        match['score_for_user'] = round(result.forward_total, 1)
+        match['score_for_match'] = round(result.reverse_total, 1)
+    
+    return {
+        'total_matches_found': top_matches.total,
+        'algorithm_version': engine.VERSION,
+        'combiner': combiner,
+        'matches': matches_data,
+    }
+
+
+def format_matches(engine, target_user, top_results, users, detail=True):
+    """
+    Response entries for (score, MatchResult) pairs of one target, with
+    reasons built per pair. ``users`` maps candidate ids to profiles with
+    their languages prefetched. With detail=False the DETAIL_FIELDS are
+    left out and never computed.
+    """
+    target_features = as_features(target_user) if detail else None
+    scored_matches = []
+    for _, result in top_results:
+        match = {
+            'user': users[result.candidate.id],
+            'compatibility_score': result.total,
+        }
+        if detail:
+            compatibility_data = result.explain(engine, target_features)
+            match.update({
+                'parameter_scores': compatibility_data['parameter_scores'],
+                'insights': compatibility_data['insights'],
+                'risk_factors': compatibility_data['risk_factors']
+            })
+        scored_matches.append(match)
+    
+    # Format response
+    matches_data = []
+    for match in scored_matches:  # Top 25 matches
+        user = match['user']
+        match_data = {
+            'id': user.id,
+            'full_name': user.full_name,
+            'age': engine._calculate_age(user.date_of_birth),
+            'city': user.city,
+            'country': user.country,
+            'height': user.height_display if user.height else None,
+            'degree': user.get_degree_display() if user.degree else None,
+            'current_company': user.current_company,
+            'designation': user.designation,
+            'income': float(user.income) if user.income else None,
+            'religion': user.get_religion_display() if user.religion else None,
+            'caste': user.get_caste_display() if user.caste else None,
+            'languages_known': [lang.get_name_display() for lang in user.languages_known.all()],
+            'want_kids': user.get_want_kids_display() if user.want_kids else None,
+            'open_to_relocate': user.get_open_to_relocate_display() if user.open_to_relocate else None,
+            'compatibility_score': round(match['compatibility_score'], 1),
+        }
+        if detail:
+            match_data.update({
+                'parameter_scores': match['parameter_scores'],
+                'match_insights': match['insights'],
+                'potential_concerns': match['risk_factors']
+            })
+        matches_data.append(match_data)
+    return matches_data
+
+
+# Per-match fields only returned with detail
+DETAIL_FIELDS = ('parameter_scores', 'match_insights', 'potential_concerns')
+
+
+def encode_cursor(*key):
+    """Opaque keyset cursor for the sort key of a page's last row, e.g. (score, candidate id)"""
+    return base64.urlsafe_b64encode(pyjson.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor, *types):
+    """Sort key of an encode_cursor token, each part parsed by types; ValueError if malformed"""
+    try:
+        key = pyjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(key) != len(types):
+            raise ValueError('Wrong cursor length')
+        return tuple(parse(value) for parse, value in zip(types, key))
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def add_validators(response, etag, last_modified=None):
+    """
+    Attach the ETag and Last-Modified (a timestamp) of a response's content.
+    Such responses are per matchmaker and revalidated before every reuse.
+    """
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def not_modified(request, etag, last_modified=None):
+    """A 304 if the request's If-None-Match or If-Modified-Since still holds, else None"""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return add_validators(response, etag, last_modified) if response is not None else None
+
+
+def build_match_page(engine, target_user, limit, cursor=None, detail=False):
+    """
+    One page of a target's ranked matches, read from the MatchScore cache
+    (pairs are only scored if missing), with the cursor of the next page
+    """
+    prefetch_related_objects([target_user], 'languages_known')
+    
+    cache = MatchScoreCache(engine)
+    entries, total, has_more = cache.page(target_user, candidate_pool(target_user), limit, cursor, threshold=30)
+    results = cache.results(target_user, [candidate_id for candidate_id, _ in entries])
+    page = [(score, results[candidate_id]) for candidate_id, score in entries]
+    page_users = User.objects.prefetch_related('languages_known').in_bulk([candidate_id for candidate_id, _ in entries])
+    
+    return {
+        'total_matches_found': total,
+        'algorithm_version': engine.VERSION,
+        'matches': format_matches(engine, target_user, page, page_users, detail),
+        'next_cursor': encode_cursor(*entries[-1][::-1]) if has_more else None,
+    }
+
+
+def materialize_match_list(target_user, engine=None):
+    """Recompute and store a target's MatchList, settling its queued job"""
+    started_at = timezone.now()
+    engine = engine or AdvancedMatchmakingEngine()
+    match_list = MatchList.store(
+        target_user, started_at, weights_hash=weights_fingerprint(engine), **build_match_list(engine, target_user)
+    )
+    MatchListJob.complete([target_user.id], started_at)
+    return match_list
 
 
 class MatchesView(APIView):
     """
     APIView to get potential matches for a specific user
     GET /api/v1/matches/?id=123
+    
+    Serves the materialized MatchList (computed on first access);
+    ?fresh=1 recomputes it synchronously.
+    ?limit=N (at most 100) pages through the full ranking instead, served
+    from the MatchScore cache; pass the returned next_cursor as ?cursor=
+    for the following page.
+    ?mode=mutual ranks by two-sided fit instead, combined with
+    ?combiner=min|geometric|harmonic (default geometric).
+    ?detail=0|1 drops or includes parameter_scores and reasons; they are
+    included by default, except for pages.
+    
+    Responses carry a weak ETag fingerprinting the target, its candidate
+    pool and the engine; If-None-Match with it gets a 304 before any
+    scoring. Lists still awaiting a recompute carry none.
     """
     permission_classes = [IsMatchMaker]
     
+    MAX_LIMIT = 100
+    
     def get(self, request):
         try:
             matchmaker = request.user
@@ -656,7 +933,35 @@ class MatchesView(APIView):
                     'status': 'error'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            return self._get_matches_for_user(matchmaker, user_id)
+            combiner = None
+            if request.query_params.get('mode') == 'mutual':
+                combiner = request.query_params.get('combiner', 'geometric')
+                if combiner not in COMBINERS:
+                    return Response({
+                        'error': f"combiner must be one of: {', '.join(COMBINERS)}",
+                        'status': 'error'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+            
+            limit = request.query_params.get('limit')
+            cursor = request.query_params.get('cursor')
+            paginated = limit is not None or cursor is not None
+            try:
+                limit = max(1, min(int(limit or 25), self.MAX_LIMIT))
+                cursor = decode_cursor(cursor, float, int) if cursor else None
+            except ValueError:
+                return Response({
+                    'error': 'limit must be an integer and cursor a next_cursor value',
+                    'status': 'error'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            detail = request.query_params.get('detail')
+            detail = detail in ('1', 'true') if detail is not None else not paginated
+            
+            fresh = request.query_params.get('fresh') in ('1', 'true')
+            return self._get_matches_for_user(
+                request, matchmaker, user_id, fresh=fresh, combiner=combiner, detail=detail,
+                limit=limit if paginated else None, cursor=cursor,
+            )
         
         except Exception as e:
             return Response({
@@ -664,7 +969,7 @@ class MatchesView(APIView):
                 'status': 'error'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
-    def _get_matches_for_user(self, matchmaker, user_id):
+    def _get_matches_for_user(self, request, matchmaker, user_id, fresh=False, combiner=None, detail=True, limit=None, cursor=None):
 
         try:
             # Get target user
@@ -676,72 +981,65 @@ class MatchesView(APIView):
                     'status': 'error'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Initialize matching engine
             engine = AdvancedMatchmakingEngine()
+            etag = self._etag(request, engine, target_user)
+            unchanged = not_modified(request, etag) if not fresh else None
+            if unchanged is not None:
+                return unchanged
             
-            # Get potential matches
-            opposite_gender = 'female' if target_user.gender == 'male' else 'male'
-            potential_matches = User.objects.filter(
-                gender=opposite_gender,
-            ).exclude(id=target_user.id)
-            print("potential_matches:", len(potential_matches))
-            
-            # Score all matches
-            scored_matches = []
-            for candidate in potential_matches:
-                if not candidate.date_of_birth:
-                    continue
-                    
-                compatibility_data = engine.calculate_comprehensive_score(target_user, candidate)
-                print("compatibiltiy_data:", compatibility_data)
-                
-                if compatibility_data['total_score'] > 30:  # Minimum threshold
-                    scored_matches.append({
-                        'user': candidate,
-                        'compatibility_score': compatibility_data['total_score'],
-                        'parameter_scores': compatibility_data['parameter_scores'],
-                        'insights': compatibility_data['insights'],
-                        'risk_factors': compatibility_data['risk_factors']
-                    })
-            
-            # Sort by score
-            scored_matches.sort(key=lambda x: x['compatibility_score'], reverse=True)
-            
-            # Format response
-            matches_data = []
-            for match in scored_matches[:25]:  # Top 25 matches
-                user = match['user']
-                matches_data.append({
-                    'id': user.id,
-                    'full_name': user.full_name,
-                    'age': engine._calculate_age(user.date_of_birth),
-                    'city': user.city,
-                    'country': user.country,
-                    'height': user.height_display if user.height else None,
-                    'degree': user.get_degree_display() if user.degree else None,
-                    'current_company': user.current_company,
-                    'designation': user.designation,
-                    'income': float(user.income) if user.income else None,
-                    'religion': user.get_religion_display() if user.religion else None,
-                    'caste': user.get_caste_display() if user.caste else None,
-                    'languages_known': [lang.get_name_display() for lang in user.languages_known.all()],
-                    'want_kids': user.get_want_kids_display() if user.want_kids else None,
-                    'open_to_relocate': user.get_open_to_relocate_display() if user.open_to_relocate else None,
-                    'compatibility_score': round(match['compatibility_score'], 1),
-                    'parameter_scores': match['parameter_scores'],
-                    'match_insights': match['insights'],
-                    'potential_concerns': match['risk_factors']
-                })
-            
-            return Response({
+            response = {
                 'status': 'success',
                 'user_id': target_user.id,
                 'user_name': target_user.full_name,
                 'user_gender': target_user.get_gender_display(),
-                'total_matches_found': len(scored_matches),
-                'algorithm_version': 'Research-Based v2.0',
-                'matches': matches_data
-            }, status=status.HTTP_200_OK)
+            }
+            
+            if combiner:
+                # Mutual rankings are computed on demand, not materialized
+                response['mode'] = 'mutual'
+                response.update(build_mutual_match_list(engine, target_user, combiner, detail))
+                return add_validators(Response(response, status=status.HTTP_200_OK), etag)
+            
+            if limit is not None:
+                response.update(build_match_page(engine, target_user, limit, cursor, detail))
+                return add_validators(Response(response, status=status.HTTP_200_OK), etag)
+            
+            # Read the materialized list, flagging it if a recompute is queued
+            match_list = None
+            if not fresh:
+                match_list = MatchList.objects.annotate(
+                    recompute_pending=Exists(MatchListJob.objects.filter(user=OuterRef('user')))
+                ).filter(user=target_user).first()
+            
+            if match_list is None:
+                match_list = materialize_match_list(target_user, engine)
+                match_list.recompute_pending = False
+            elif not match_list.recompute_pending and match_list.is_outdated(
+                engine.VERSION, weights_fingerprint(engine), start_of_day()
+            ):
+                # From an earlier day or another engine: queue it rather than wait for the worker to notice
+                MatchListJob.enqueue([target_user.id])
+                match_list.recompute_pending = True
+            
+            matches = match_list.matches
+            if not detail:
+                matches = [
+                    {field: value for field, value in match.items() if field not in DETAIL_FIELDS} for match in matches
+                ]
+            
+            response.update({
+                'total_matches_found': match_list.total_matches_found,
+                'algorithm_version': match_list.algorithm_version,
+                'matches': matches,
+                'computed_at': match_list.computed_at,
+                'recompute_pending': match_list.recompute_pending,
+            })
+            if match_list.recompute_pending:
+                # Outdated for the current fingerprint, so must not be reused under it
+                response = Response(response, status=status.HTTP_200_OK)
+                patch_cache_control(response, private=True, no_cache=True)
+                return response
+            return add_validators(Response(response, status=status.HTTP_200_OK), etag)
             
         except Exception as e:
             print(f"Error in advanced matching: {str(e)}")
@@ -749,8 +1047,119 @@ class MatchesView(APIView):
                 'error': f'Error finding matches: {str(e)}',
                 'status': 'error'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def _etag(self, request, engine, target_user):
+        """
+        Weak ETag of a target's matches: they only change with the target, its
+        candidate pool (edits bump updated_at, removals the count), the engine
+        and the day, which moves ages and the pool's age window
+        """
+        today = date.today()
+        pool = candidate_pool(target_user, today).aggregate(last_modified=Max('updated_at'), total=Count('id'))
+        fingerprint = pyjson.dumps([
+            target_user.id, target_user.updated_at.isoformat(), today.isoformat(),
+            pool['last_modified'].isoformat() if pool['last_modified'] else None, pool['total'],
+            engine.VERSION, weights_fingerprint(engine),
+            sorted((key, values) for key, values in request.query_params.lists() if key != 'fresh'),
+        ])
+        return 'W/' + quote_etag(hashlib.sha256(fingerprint.encode()).hexdigest()[:32])
+
+    
+
+class MatchExportView(APIView):
+    """
+    APIView streaming every candidate's score for a user as NDJSON
+    GET /api/v1/matches/export/?id=123
+    """
+    permission_classes = [IsMatchMaker]
+    
+    def get(self, request):
+        user_id = request.query_params.get('id')
+        if not user_id:
+            return Response({
+                'error': 'User ID is required',
+                'status': 'error'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        target_user = get_object_or_404(User, id=user_id, matchmaker=request.user)
+        if not target_user.date_of_birth:
+            return Response({
+                'error': 'User must have date of birth to find matches',
+                'status': 'error'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        response = StreamingHttpResponse(
+            match_export_lines(AdvancedMatchmakingEngine(), target_user), content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = f'attachment; filename="matches-{target_user.id}.ndjson"'
+        return response
+
 
+class BulkMatchesView(APIView):
+    """
+    APIView to get the top matches of several users in one pass
+    GET /api/v1/matches/bulk/              all users assigned to the matchmaker
+    GET /api/v1/matches/bulk/?ids=1,2,3    only these assigned users
+    Optional ?k= (default 25, at most 100) matches per user
+    """
+    permission_classes = [IsMatchMaker]
     
+    MAX_K = 100
+    
+    def get(self, request):
+        try:
+            matchmaker = request.user
+            users = matchmaker.assigned_users.prefetch_related('languages_known').order_by('id')
+            
+            ids = request.query_params.get('ids')
+            k = request.query_params.get('k', 25)
+            try:
+                k = int(k)
+                if ids:
+                    users = users.filter(id__in=[int(user_id) for user_id in ids.split(',')])
+            except ValueError:
+                return Response({
+                    'error': 'ids must be comma-separated integers and k an integer',
+                    'status': 'error'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            k = max(1, min(k, self.MAX_K))
+            
+            users = list(users)
+            targets = [user for user in users if user.date_of_birth]
+            
+            engine = AdvancedMatchmakingEngine()
+            top_matches = engine.find_top_matches_bulk(targets, k=k, threshold=30)
+            
+            # One profile load for every returned match of every target
+            top_users = User.objects.prefetch_related('languages_known').in_bulk(
+                {result.candidate.id for selector in top_matches.values() for _, result in selector.results()}
+            )
+            
+            results = []
+            for target_user in targets:
+                selector = top_matches[target_user.id]
+                results.append({
+                    'user_id': target_user.id,
+                    'user_name': target_user.full_name,
+                    'user_gender': target_user.get_gender_display(),
+                    'total_matches_found': selector.total,
+                    'matches': format_matches(engine, target_user, selector.results(), top_users),
+                })
+            
+            return Response({
+                'status': 'success',
+                'total_users': len(results),
+                'algorithm_version': engine.VERSION,
+                'skipped_user_ids': [user.id for user in users if not user.date_of_birth],
+                'results': results,
+            }, status=status.HTTP_200_OK)
+        
+        except Exception as e:
+            return Response({
+                'error': f'Internal server error: {str(e)}',
+                'status': 'error'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 
 # API endpoint for generating matchmaker email
 @csrf_exempt
@@ -148,6 +148,34 @@ AUTH_USER_MODEL = 'api.MatchMaker'
  
 JWT_ACCESS_TOKEN_LIFETIME = datetime.timedelta(days=7)
 JWT_REFRESH_TOKEN_LIFETIME = datetime.timedelta(days=14)
+# Authenticated matchmakers cached per process, each for at most TTL seconds
+JWT_PRINCIPAL_CACHE_SIZE = 1024
+JWT_PRINCIPAL_CACHE_TTL = 300
+# Trust the username claim of tokens instead of loading the matchmaker;
+# deactivating a matchmaker then only takes effect when their tokens expire
+JWT_STATELESS_AUTH = False
+
+# Processes used to score large candidate pools (1 = serial)
+MATCHING_WORKERS = 1
+
+# Knowledge-base embeddings, written by `manage.py build_kb_index`
+KB_INDEX_PATH = BASE_DIR / 'kb-index.npy'
+
+# Embeddings of the LLM pipeline: 'huggingface', or 'local' for the
+# deterministic offline stand-in. Vectors are cached in memory and in the
+# CachedEmbedding table.
+EMBEDDING_BACKEND = 'huggingface'
+EMBEDDING_CACHE_MEMORY_SIZE = 1024
+EMBEDDING_CACHE_MAX_ENTRIES = 100000
+# Texts per embedding request
+EMBEDDING_BATCH_SIZE = 32
+
+# LLM compatibility evaluations: calls in flight (a full top 25 at once),
+# seconds per attempt, retries after a failed attempt and their base backoff
+LLM_CONCURRENCY = 25
+LLM_TIMEOUT = 60
+LLM_RETRIES = 2
+LLM_BACKOFF = 1.0
 
 
 # settings.py
@@ -1,3 +1,4 @@
 #!/bin/bash
 python manage.py migrate --noinput
+python manage.py materialize_matches --all &
 gunicorn assignment.wsgi:application --bind 0.0.0.0:8000